@@ -0,0 +1,233 @@
+"""
+Batch solving of many instances across a process pool, e.g. as a nightly job over the daily instances.
+Every instance is loaded in a worker of its own, its result is written atomically in the store_result_V3 format,
+and a summary table lists the objective values, times and errors of all instances.
+
+The algorithm is given as a name followed by options, e.g. greedy_simultaneous, tabu:iterations=200,gap=0.02
+or tabu:budget=60, cluster_mip:budget=120.
+
+Usage:
+    python batch.py "./data/InstancesV3/*.xlsx" --algorithm tabu:budget=30 --output results/nightly
+"""
+# module importation
+import argparse
+import csv
+import glob
+import os
+import random as rd
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+ALGORITHMS = ["greedy_employee", "greedy_simultaneous", "tabu", "cluster_mip"]
+SUMMARY_COLUMNS = ["instance", "algorithm", "status", "task_minutes", "distance_km", "load_time", "solve_time",
+                   "result_path", "error"]
+
+
+def parse_algorithm(spec):
+    """
+    Parse an algorithm spec such as "tabu:iterations=200,gap=0.02"
+    :return: (algorithm name, dictionary of options)
+    """
+    name, _, options_text = spec.partition(":")
+    if name not in ALGORITHMS:
+        raise ValueError(f"unknown algorithm {name}, expected one of {ALGORITHMS}")
+    options = {}
+    for option in filter(None, options_text.split(",")):
+        key, _, value = option.partition("=")
+        if key not in ["budget", "iterations", "gap", "seed"]:
+            raise ValueError(f"unknown option {key} of algorithm {name}")
+        options[key] = int(value) if key in ["iterations", "seed"] else float(value)
+    return name, options
+
+
+def solve(algorithm, result_path, seed=0, budget=None, iterations=None, gap=None, stop=None, sinks=()):
+    """
+    Solve the currently loaded instance and write the result file
+    :param budget: time limit in seconds of the tabu search or of the whole MIP
+    :param iterations: maximum number of iterations of the tabu search, unlimited when a budget is given and 30
+    otherwise, a gap alone not removing the limit since the bounds may be too loose for the gap to be reached
+    :param gap: relative gap to the upper bound of the task minutes stopping the tabu search early (cf. bounds.py)
+    :param stop: function returning True to interrupt the tabu search
+    :param sinks: instrumentation sinks receiving the iterations of the tabu search
+    :return: (task minutes, distance in km, names of the employees whose day cannot be timed, e.g. who cannot
+    have lunch, whose lunch field is left empty in the result file, cf. utils.write_result)
+    """
+    import models_v3_greedy
+    import models_v3_tabu
+    from instrumentation import Instrumentation
+    from models_v2 import Employee
+    from replanning import Schedule
+    from utils import store_result_V3
+
+    rd.seed(seed)
+    np.random.seed(seed)
+    temporary_path = result_path + ".tmp"
+    untimed = []
+    if algorithm in ["greedy_employee", "greedy_simultaneous"]:
+        sol = models_v3_greedy.GreedySolution()
+        if algorithm == "greedy_employee":
+            sol.optimize_employee_by_employee()
+        else:
+            sol.optimize_simultaneous()
+        sol.resequence()
+        Schedule.from_greedy(sol).write_result(temporary_path)
+        task_minutes, distance_km = sol.calculate_time(), sol.calculate_distance()
+    elif algorithm == "tabu":
+        if iterations is None:
+            iterations = 10 ** 9 if budget else 30
+        models_v3_tabu.Solution.set_warning(False)
+        with Instrumentation.session(*sinks):
+            routes, _ = models_v3_tabu.tabu_search(
+                init_sol=" ", max_it=iterations, tabu_step=10, max_len_cross=1, block_max=4, plot=False,
+                verbose=False, time_limit=budget, stop=stop, gap_tolerance=gap)
+        schedule = Schedule.from_routes(routes)
+        schedule.repair()
+        untimed = [Employee.list[k].name for k in sorted(schedule.infeasible)]
+        schedule.write_result(temporary_path)
+        task_minutes, distance_km = schedule.calculate_time(), schedule.calculate_distance()
+    elif algorithm == "cluster_mip":
+        from models_v3_cluster import solve_cluster_mip
+        time_limit = budget / max(Employee.count, 1) if budget else 15
+        Z, B, lunch_times, task_minutes, distance = solve_cluster_mip(time_limit, random_state=seed)
+        store_result_V3(temporary_path, Employee.list, models_v3_greedy.tasks, lunch_times, Z, B)
+        distance_km = distance / 1000
+    else:
+        raise ValueError(f"unknown algorithm {algorithm}")
+    # the result file appears complete or not at all, even if the batch is killed
+    os.replace(temporary_path, result_path)
+    return float(task_minutes), float(distance_km), untimed
+
+
+def result_path_of(instance_path, algorithm, output_directory):
+    """e.g. InstanceUkraineV3.xlsx -> SolutionUkraineV3_tabu.txt, a name checker.py matches with its instance"""
+    name = os.path.splitext(os.path.basename(instance_path))[0]
+    if name.startswith("Instance"):
+        name = name[len("Instance"):]
+    return os.path.join(output_directory, f"Solution{name}_{algorithm}.txt")
+
+
+def solve_instance(instance_path, algorithm, options, output_directory):
+    """
+    Load an instance in the worker and solve it, never raising so that one bad instance cannot stop the batch.
+    The result file is read back, the row failing without objective values if it cannot be.
+    """
+    import models_v3_tabu
+    from utils import read_result
+
+    row = {"instance": instance_path, "algorithm": algorithm, "status": "done"}
+    try:
+        tic = time.perf_counter()
+        models_v3_tabu.load_data_from_path(instance_path)
+        row["load_time"] = time.perf_counter() - tic
+        row["result_path"] = result_path_of(instance_path, algorithm, output_directory)
+        tic = time.perf_counter()
+        row["task_minutes"], row["distance_km"], untimed = solve(algorithm, row["result_path"], **options)
+        row["solve_time"] = time.perf_counter() - tic
+        try:
+            read_result(row["result_path"])
+        except Exception as error:
+            del row["task_minutes"], row["distance_km"]
+            row.update(status="failed", error=f"unreadable result file, {type(error).__name__}: {error}")
+            return row
+        if untimed:
+            row.update(status="partial", error=f"no feasible day for {', '.join(untimed)}")
+    except ImportError as error:  # e.g. gurobipy for the MIP
+        row.update(status="skipped", error=str(error))
+    except Exception as error:
+        row.update(status="failed", error=f"{type(error).__name__}: {error}")
+    return row
+
+
+def run_batch(instance_paths, algorithm, options, output_directory, workers=None, resume=False,
+              tasks_per_worker=20, on_row=None):
+    """
+    Solve the instances in a process pool.
+    Workers are replaced after tasks_per_worker instances, and the instances of a worker which crashed (e.g. out of
+    memory) are retried once in a new pool.
+    :param resume: skip the instances whose result file already exists
+    :param on_row: function called with the summary row of each instance as soon as it is solved
+    :return: the summary rows, in the order of instance_paths
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    rows = {}
+    pending = []
+    for path in instance_paths:
+        result_path = result_path_of(path, algorithm, output_directory)
+        if resume and os.path.exists(result_path):
+            rows[path] = {"instance": path, "algorithm": algorithm, "status": "existing", "result_path": result_path}
+            if on_row:
+                on_row(rows[path])
+        else:
+            pending.append(path)
+
+    for attempt in range(2):
+        crashed = []
+        if not pending:
+            break
+        with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=tasks_per_worker) as executor:
+            futures = {executor.submit(solve_instance, path, algorithm, options, output_directory): path
+                       for path in pending}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    row = future.result()
+                except BrokenProcessPool:
+                    crashed.append(path)
+                    continue
+                rows[path] = row
+                if on_row:
+                    on_row(row)
+        pending = crashed
+    for path in pending:
+        rows[path] = {"instance": path, "algorithm": algorithm, "status": "crashed",
+                      "error": "the worker process died twice"}
+        if on_row:
+            on_row(rows[path])
+    return [rows[path] for path in instance_paths]
+
+
+def write_summary(rows, path):
+    """Write the summary rows as a CSV table, atomically"""
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, SUMMARY_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(temporary_path, path)
+
+
+def print_row(row):
+    if "task_minutes" in row:
+        print(f"{os.path.basename(row['instance']):<32}{row['status']:<10}{row['task_minutes']:>10.0f}"
+              f"{row['distance_km']:>10.1f}{row['solve_time']:>10.2f}  {row.get('error', '')}", flush=True)
+    else:
+        print(f"{os.path.basename(row['instance']):<32}{row['status']:<10}{row.get('error', '')}", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve many instances in parallel")
+    parser.add_argument("instances", nargs="+", help="glob patterns of instance files")
+    parser.add_argument("--algorithm", default="greedy_simultaneous",
+                        help="algorithm and options, e.g. tabu:budget=60,gap=0.02")
+    parser.add_argument("--output", default="./results/batch", help="directory of the result files")
+    parser.add_argument("--summary", help="path of the CSV summary, defaults to summary.csv in the output directory")
+    parser.add_argument("--workers", type=int, help="number of processes, defaults to the number of CPUs")
+    parser.add_argument("--resume", action="store_true", help="skip the instances already solved")
+    args = parser.parse_args(argv)
+
+    algorithm, options = parse_algorithm(args.algorithm)
+    paths = sorted({path for pattern in args.instances for path in glob.glob(pattern)})
+    if not paths:
+        parser.error("no instance matches the patterns")
+    print(f"{'instance':<32}{'status':<10}{'minutes':>10}{'km':>10}{'solve (s)':>10}")
+    rows = run_batch(paths, algorithm, options, args.output, args.workers, args.resume, on_row=print_row)
+    write_summary(rows, args.summary or os.path.join(args.output, "summary.csv"))
+    return 0 if all(row["status"] in ["done", "partial", "existing", "skipped"] for row in rows) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
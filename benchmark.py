@@ -0,0 +1,242 @@
+"""
+Benchmark of the solvers over the bundled instances.
+
+Usage:
+    python benchmark.py --output bench.json
+    python benchmark.py --solvers greedy_simultaneous tabu --baseline results/benchmark_baseline.json
+    python benchmark.py --save-baseline results/benchmark_baseline.json
+"""
+# module importation
+import argparse
+import contextlib
+import functools
+import glob
+import io
+import json
+import os
+import random as rd
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+# model classes for employees and nodes
+import models_v3_greedy
+import models_v3_tabu
+from instrumentation import Instrumentation, MemorySink
+
+INSTANCE_PATTERNS = ["./data/InstancesV1/*.xlsx", "./data/InstancesV2/*.xlsx", "./data/InstancesV3/*.xlsx"]
+
+# metrics for which a higher value than the baseline is a regression, and those for which a lower value is
+LOWER_IS_BETTER = ["load_time", "distance_time", "solve_time", "peak_memory_kb", "distance_km"]
+HIGHER_IS_BETTER = ["task_minutes"]
+
+
+def solve_greedy_employee():
+    sol = models_v3_greedy.GreedySolution().optimize_employee_by_employee()
+    return sol.calculate_time(), sol.calculate_distance()
+
+
+def solve_greedy_simultaneous():
+    sol = models_v3_greedy.GreedySolution().optimize_simultaneous()
+    return sol.calculate_time(), sol.calculate_distance()
+
+
+def solve_tabu(max_it=30):
+    models_v3_tabu.Solution.set_warning(False)
+    sol, (task_minutes, distance) = models_v3_tabu.tabu_search(init_sol=" ", max_it=max_it, tabu_step=10,
+                                                               max_len_cross=1, block_max=4, plot=False,
+                                                               verbose=False)
+    return task_minutes, distance / 1000
+
+
+def solve_cluster_mip(seed=0):
+    from models_v3_cluster import solve_cluster_mip as solve
+    _, _, _, task_minutes, distance = solve(random_state=seed)
+    return task_minutes, distance / 1000
+
+
+SOLVERS = {
+    "greedy_employee": solve_greedy_employee,
+    "greedy_simultaneous": solve_greedy_simultaneous,
+    "tabu": solve_tabu,
+    "cluster_mip": solve_cluster_mip,
+}
+
+
+def load_instance(path, sparse=None):
+    """
+    Load an instance with the loader of the solvers, timing the reading and the distance matrix separately
+    :param sparse: whether to store only the nearest neighbours of each node, see Node.initialize_distance
+    :return: (load time, distance matrix time) in seconds
+    """
+    memory = MemorySink()
+    with Instrumentation.session(memory):
+        models_v3_tabu.load_data_from_path(path, sparse)
+    timers = memory.records[-1]["timers"]
+    return timers["load"]["seconds"], timers["distance_matrix"]["seconds"]
+
+
+def run_solver(solver, seed, track_memory=True):
+    """
+    Run a solver with a fixed seed and measure its time and peak memory.
+    Tracing the allocations slows pure Python code down, compare times only between runs with the same setting.
+    """
+    rd.seed(seed)
+    np.random.seed(seed)
+    if track_memory:
+        tracemalloc.start()
+    try:
+        tic = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # the solvers print their progress
+            task_minutes, distance_km = solver()
+        solve_time = time.perf_counter() - tic
+        peak = tracemalloc.get_traced_memory()[1] if track_memory else 0
+    finally:
+        tracemalloc.stop()
+    metrics = {"solve_time": solve_time,
+               "task_minutes": float(task_minutes),
+               "distance_km": float(distance_km)}
+    if track_memory:
+        metrics["peak_memory_kb"] = peak / 1024
+    return metrics
+
+
+def run_benchmark(instance_paths, solver_names, seed=0, solvers=None, track_memory=True, sparse=None):
+    """
+    Solve each instance with each solver
+    :param solvers: functions to use instead of those of SOLVERS, by solver name
+    :param sparse: whether the instances are loaded with sparse distances, by size when None
+    :return: the report, a dictionary {instance name: metrics} which can be dumped as JSON
+    """
+    solvers = dict(SOLVERS, **(solvers or {}))
+    report = {"seed": seed, "solvers": solver_names, "track_memory": track_memory, "sparse": sparse,
+              "instances": {}}
+    for path in instance_paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        entry = {"path": path}
+        report["instances"][name] = entry
+        try:
+            entry["load_time"], entry["distance_time"] = load_instance(path, sparse)
+        except Exception as error:  # e.g. an instance whose sheets are named differently
+            entry["error"] = f"{type(error).__name__}: {error}"
+            continue
+        entry["solvers"] = {}
+        for solver_name in solver_names:
+            try:
+                entry["solvers"][solver_name] = run_solver(solvers[solver_name], seed, track_memory)
+            except ImportError as error:
+                entry["solvers"][solver_name] = {"skipped": str(error)}
+            except Exception as error:
+                entry["solvers"][solver_name] = {"error": f"{type(error).__name__}: {error}"}
+    return report
+
+
+def compare_to_baseline(report, baseline, tolerance=0.2, min_seconds=0.01):
+    """
+    List the metrics of the report which are worse than in the baseline.
+    Times and memory may exceed the baseline by the relative tolerance before being reported,
+    and time differences below min_seconds are considered as noise.
+    An instance or a solver which worked in the baseline and fails, or is missing, in the report is a regression,
+    except a solver which was not run at all.
+    :return: a list of human readable regressions
+    """
+    regressions = []
+
+    def check(where, metric, value, reference):
+        if metric.endswith("_time") and value - reference < min_seconds:
+            return
+        if metric in LOWER_IS_BETTER:
+            slack = tolerance if metric != "distance_km" else 1e-6
+            if value > reference * (1 + slack):
+                regressions.append(f"{where}: {metric} {value:.4g} > baseline {reference:.4g}")
+        elif metric in HIGHER_IS_BETTER and value < reference * (1 - 1e-6):
+            regressions.append(f"{where}: {metric} {value:.4g} < baseline {reference:.4g}")
+
+    for name, reference_entry in baseline["instances"].items():
+        # only what worked in the baseline can regress
+        if "error" in reference_entry:
+            continue
+        entry = report["instances"].get(name)
+        if entry is None:
+            regressions.append(f"{name}: missing from the report")
+            continue
+        if "error" in entry:
+            regressions.append(f"{name}: {entry['error']}")
+            continue
+        for metric in ["load_time", "distance_time"]:
+            check(name, metric, entry[metric], reference_entry[metric])
+        for solver_name, reference_metrics in reference_entry["solvers"].items():
+            if "solve_time" not in reference_metrics:
+                continue
+            metrics = entry["solvers"].get(solver_name)
+            if metrics is None:
+                if solver_name in report["solvers"]:
+                    regressions.append(f"{name}/{solver_name}: missing from the report")
+                continue
+            if "solve_time" not in metrics:
+                regressions.append(f"{name}/{solver_name}: {metrics.get('error', metrics.get('skipped'))}")
+                continue
+            for metric, reference in reference_metrics.items():
+                if metric in metrics:
+                    check(f"{name}/{solver_name}", metric, metrics[metric], reference)
+    return regressions
+
+
+def print_report(report):
+    print(f"{'instance':<28}{'solver':<22}{'solve (s)':>10}{'peak (kB)':>12}{'minutes':>10}{'km':>10}")
+    for name, entry in report["instances"].items():
+        if "error" in entry:
+            print(f"{name:<28}{entry['error']}")
+            continue
+        for solver_name, metrics in entry["solvers"].items():
+            if "solve_time" not in metrics:
+                print(f"{name:<28}{solver_name:<22}{metrics.get('skipped', metrics.get('error'))}")
+                continue
+            print(f"{name:<28}{solver_name:<22}{metrics['solve_time']:>10.3f}{metrics.get('peak_memory_kb', 0):>12.0f}"
+                  f"{metrics['task_minutes']:>10.0f}{metrics['distance_km']:>10.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the solvers over the bundled instances")
+    parser.add_argument("--instances", nargs="+", default=INSTANCE_PATTERNS, help="glob patterns of instance files")
+    parser.add_argument("--solvers", nargs="+", default=list(SOLVERS), choices=list(SOLVERS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tabu-iterations", type=int, default=30)
+    parser.add_argument("--no-memory", action="store_true", help="do not trace the peak memory of the solvers")
+    distances = parser.add_mutually_exclusive_group()
+    distances.add_argument("--sparse", dest="sparse", action="store_const", const=True,
+                           help="store only the nearest neighbours of each node, by default above Node.dense_limit")
+    distances.add_argument("--dense", dest="sparse", action="store_const", const=False,
+                           help="always compute the full distance matrix")
+    parser.add_argument("--output", help="path of the JSON report")
+    parser.add_argument("--baseline", help="JSON report to compare with, regressions make the exit code 1")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative tolerance on times and memory")
+    parser.add_argument("--save-baseline", help="store the report as the new baseline")
+    args = parser.parse_args(argv)
+
+    paths = sorted(path for pattern in args.instances for path in glob.glob(pattern))
+    solvers = {"tabu": functools.partial(solve_tabu, max_it=args.tabu_iterations),
+               "cluster_mip": functools.partial(solve_cluster_mip, seed=args.seed)}
+    report = run_benchmark(paths, args.solvers, args.seed, solvers, track_memory=not args.no_memory,
+                           sparse=args.sparse)
+    print_report(report)
+
+    for target in [args.output, args.save_baseline]:
+        if target:
+            with open(target, "w") as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
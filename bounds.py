@@ -0,0 +1,132 @@
+"""
+Upper bounds on the task minutes performable in the currently loaded instance, to know how far a solution is from
+optimal and to stop a search once the remaining gap is small.
+
+Usage:
+    python bounds.py ./data/InstancesV3/InstanceUkraineV3.xlsx
+"""
+# module importation
+import argparse
+from math import ceil
+
+import numpy as np
+
+# model classes for employees and nodes
+from models_v2 import Employee, Node
+import models_v3_greedy
+
+LUNCH_DURATION = 60
+
+
+class Bounds:
+    """Upper bounds on the performable task minutes, the tightest being bound"""
+
+    def __init__(self, all_tasks, reachable, capacity):
+        self.all_tasks = all_tasks  # total duration of the tasks
+        self.reachable = reachable  # total duration of the tasks some eligible employee can reach in their day
+        self.capacity = capacity  # capacity relaxation
+        self.bound = min(all_tasks, reachable, capacity)
+
+    def gap(self, task_minutes):
+        """Relative gap between a solution and the bound, 0 when the solution is proven optimal"""
+        return (self.bound - task_minutes) / self.bound if self.bound > 0 else 0.0
+
+    def __repr__(self):
+        return f"Bounds(all_tasks={self.all_tasks}, reachable={self.reachable}, capacity={self.capacity})"
+
+
+def travel_time(distance):
+    return ceil(distance / Employee.speed)
+
+
+def min_inbound_distance(task_indices):
+    """Distance from the nearest other node to each task, a lower bound on the travel before performing it"""
+    distance = Node.distance
+    if isinstance(distance, np.ndarray):
+        inbound = distance[:, task_indices].copy()
+        inbound[task_indices, np.arange(len(task_indices))] = np.inf
+        return inbound.min(axis=0)
+    # sparse distances: the nearest neighbour is stored first
+    return np.array([distance.nearest(i)[1][0] for i in task_indices])
+
+
+def employee_capacity(employee):
+    """Minutes an employee can spend on tasks and travels: working hours minus lunch and unavailabilities"""
+    unavailable = sum(max(min(u.closing_time, employee.end_time) - max(u.opening_time, employee.start_time), 0)
+                      for u in employee.unavails)
+    return max(employee.end_time - employee.start_time - LUNCH_DURATION - unavailable, 0)
+
+
+def compute_bounds():
+    """
+    Compute upper bounds on the task minutes of the currently loaded instance:
+    - the total duration of the tasks;
+    - the duration of the tasks which an employee of sufficient level can reach from home, perform in one of its
+      open intervals and come back from within their working hours;
+    - a capacity relaxation: each task performed by an employee uses its duration plus the travel from the nearest
+      other node of the employee's capacity (working hours minus lunch and unavailabilities), tasks being split
+      fractionally between the employees of sufficient level.
+    :return: a Bounds object
+    """
+    tasks = models_v3_greedy.tasks
+    if not tasks:
+        return Bounds(0, 0, 0)
+    duration = np.array([Node.list[i].duration for i in tasks], dtype=float)
+    level = np.array([Node.list[i].level for i in tasks])
+
+    # reachability, level by level
+    reachable = np.zeros(len(tasks), dtype=bool)
+    for k, employee in enumerate(Employee.list):
+        for t, i in enumerate(tasks):
+            if reachable[t] or level[t] > employee.level:
+                continue
+            go, back = travel_time(Node.distance[k, i]), travel_time(Node.distance[i, k])
+            for start, end in Node.list[i].open_intervals():
+                begin = max(start, employee.start_time + go)
+                if begin + duration[t] <= min(end, employee.end_time - back):
+                    reachable[t] = True
+                    break
+
+    # capacity relaxation: with nested skill levels, the employees of level at least L are the only ones able to
+    # perform the tasks of level L and above, which gives one knapsack constraint per level; for such nested
+    # constraints, filling the tasks by decreasing minutes per minute of capacity is optimal
+    weight = duration + np.array([travel_time(d) for d in min_inbound_distance(tasks)])
+    capacity_by_level = {}
+    for employee in Employee.list:
+        capacity_by_level[employee.level] = capacity_by_level.get(employee.level, 0) + employee_capacity(employee)
+    levels = sorted(set(capacity_by_level) | set(level.tolist()))
+    # remaining[L]: capacity of the employees of level at least L not used yet
+    remaining = {L: sum(c for l, c in capacity_by_level.items() if l >= L) for L in levels}
+    capacity_bound = 0.0
+    for t in np.argsort(-duration / weight, kind="stable"):
+        if not reachable[t]:
+            continue
+        room = min(remaining[L] for L in levels if L <= level[t])
+        fraction = min(1.0, room / weight[t])
+        if fraction <= 0:
+            continue
+        capacity_bound += fraction * duration[t]
+        for L in levels:
+            if L <= level[t]:
+                remaining[L] -= fraction * weight[t]
+
+    return Bounds(int(duration.sum()), int(duration[reachable].sum()), int(capacity_bound + 1e-9))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Upper bounds on the task minutes of an instance")
+    parser.add_argument("instance", help="path of the instance file")
+    args = parser.parse_args(argv)
+
+    models_v3_greedy.load_data_from_path(args.instance)
+    bounds = compute_bounds()
+    print(bounds)
+    for name in ["optimize_employee_by_employee", "optimize_simultaneous"]:
+        sol = models_v3_greedy.GreedySolution()
+        getattr(sol, name)()
+        task_minutes = sol.calculate_time()
+        print(f"{name}: {task_minutes} minutes, gap {bounds.gap(task_minutes):.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+"""
+Standalone checker of result files against their instance.
+Every constraint is checked for every employee at once with NumPy arrays, and all violations are reported.
+
+Usage:
+    python checker.py ./data/InstancesV3/InstanceUkraineV3.xlsx ./results/Tabu/SolutionUkraineV3byV3.txt
+    python checker.py --directory ./results
+"""
+# module importation
+import argparse
+import glob
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# utilities
+from utils import parse_time_minute, read_result
+
+SPEED = 50 * 1000 / 60  # unit: meter/minute, as Employee.speed
+EARTH_RADIUS = 6371000  # in meter
+LUNCH_EARLIEST, LUNCH_LATEST, LUNCH_DURATION = 12 * 60, 13 * 60, 60
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Vectorized version of Node.calculate_distance, in meter"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(a))
+
+
+def read_sheet(sheets, name):
+    """Return the sheet whatever the case of its name, some instances write 'Employees unavailabilities'"""
+    for sheet_name, df in sheets.items():
+        if sheet_name.lower() == name.lower():
+            return df
+    raise KeyError(f"Worksheet named '{name}' not found")
+
+
+def minutes(column):
+    return np.array([parse_time_minute(t) for t in column], dtype=np.int64)
+
+
+class Instance:
+    """The data of an instance file stored as arrays, independently of the model classes"""
+
+    def __init__(self, path):
+        sheets = pd.read_excel(path, sheet_name=None)
+        employees = read_sheet(sheets, "Employees")
+        tasks = read_sheet(sheets, "Tasks")
+        task_unavails = read_sheet(sheets, "Tasks Unavailabilities")
+        unavails = read_sheet(sheets, "Employees Unavailabilities")
+
+        self.employee_names = list(employees["EmployeeName"])
+        self.employee_index = {name: k for k, name in enumerate(self.employee_names)}
+        self.employee_lat = employees["Latitude"].to_numpy(dtype=float)
+        self.employee_lon = employees["Longitude"].to_numpy(dtype=float)
+        self.employee_level = employees["Level"].to_numpy()
+        self.employee_start = minutes(employees["WorkingStartTime"])
+        self.employee_end = minutes(employees["WorkingEndTime"])
+
+        self.task_ids = list(tasks["TaskId"])
+        self.task_index = {task_id: i for i, task_id in enumerate(self.task_ids)}
+        self.task_lat = tasks["Latitude"].to_numpy(dtype=float)
+        self.task_lon = tasks["Longitude"].to_numpy(dtype=float)
+        self.task_duration = tasks["TaskDuration"].to_numpy(dtype=np.int64)
+        self.task_level = tasks["Level"].to_numpy()
+        self.task_opening = minutes(tasks["OpeningTime"])
+        self.task_closing = minutes(tasks["ClosingTime"])
+        # closed intervals as parallel arrays (task index, start, end)
+        self.closed_task = np.array([self.task_index[t] for t in task_unavails["TaskId"]], dtype=np.int64)
+        self.closed_start = minutes(task_unavails["Start"])
+        self.closed_end = minutes(task_unavails["End"])
+
+        self.unavail_employee = np.array([self.employee_index[name] for name in unavails["EmployeeName"]],
+                                         dtype=np.int64)
+        self.unavail_lat = unavails["Latitude"].to_numpy(dtype=float)
+        self.unavail_lon = unavails["Longitude"].to_numpy(dtype=float)
+        self.unavail_start = minutes(unavails["Start"])
+        self.unavail_end = minutes(unavails["End"])
+
+
+class CheckReport:
+    """Violations and objective values of a result file"""
+
+    def __init__(self, instance_path, result_path):
+        self.instance_path = instance_path
+        self.result_path = result_path
+        self.violations = []  # (constraint, message)
+        self.task_minutes = 0
+        self.distance_km = 0.0
+
+    def add(self, constraint, message):
+        self.violations.append((constraint, message))
+
+    @property
+    def feasible(self):
+        return not self.violations
+
+    def __str__(self):
+        lines = [f"{self.result_path} against {self.instance_path}: "
+                 f"{'feasible' if self.feasible else f'{len(self.violations)} violation(s)'}, "
+                 f"{self.task_minutes} minutes of tasks, {self.distance_km:.1f} km"]
+        lines += [f"  {constraint}: {message}" for constraint, message in self.violations]
+        return "\n".join(lines)
+
+
+def check(instance_path, result_path):
+    """
+    Check a result file, in the store_result_V3 format, against its instance
+    :return: a CheckReport listing every violation
+    """
+    instance = Instance(instance_path) if isinstance(instance_path, str) else instance_path
+    result = read_result(result_path)
+    report = CheckReport(instance_path if isinstance(instance_path, str) else "instance", result_path)
+    T = len(instance.employee_names)
+
+    # C2: each task is performed at most once, by a known employee
+    performed = result.performed_tasks()
+    seen = set()
+    task, employee, start = [], [], []
+    for task_id, name, begin in performed:
+        if task_id not in instance.task_index:
+            report.add("C2", f"unknown task {task_id}")
+            continue
+        if name not in instance.employee_index:
+            report.add("C2", f"task {task_id} performed by unknown employee {name}")
+            continue
+        if task_id in seen:
+            report.add("C2", f"task {task_id} is performed more than once")
+            continue
+        seen.add(task_id)
+        task.append(instance.task_index[task_id])
+        employee.append(instance.employee_index[name])
+        start.append(begin)
+    task = np.array(task, dtype=np.int64)
+    employee = np.array(employee, dtype=np.int64)
+    start = np.array(start, dtype=float)
+    finish = start + instance.task_duration[task]
+    task_ids = np.array(instance.task_ids, dtype=object)
+
+    # C5: opening and closing times, and closed intervals
+    for i in np.flatnonzero((start < instance.task_opening[task]) | (finish > instance.task_closing[task])):
+        report.add("C5", f"task {task_ids[task[i]]} done in [{start[i]}, {finish[i]}] outside of its opening time")
+    if len(instance.closed_task) and len(task):
+        position = np.full(len(instance.task_ids), -1)
+        position[task] = np.arange(len(task))
+        p = position[instance.closed_task]
+        done = p >= 0
+        p, closed_start, closed_end = p[done], instance.closed_start[done], instance.closed_end[done]
+        for q in np.flatnonzero((start[p] < closed_end) & (finish[p] > closed_start)):
+            report.add("C5", f"task {task_ids[task[p[q]]]} done during its closed interval "
+                             f"[{closed_start[q]}, {closed_end[q]}]")
+
+    # C13: skill levels
+    for i in np.flatnonzero(instance.employee_level[employee] < instance.task_level[task]):
+        report.add("C13", f"task {task_ids[task[i]]} requires a higher level than {instance.employee_names[employee[i]]}")
+
+    # the day of each employee as a sequence of visits: home, tasks and unavailabilities, home
+    U = len(instance.unavail_employee)
+    visit_employee = np.concatenate([np.arange(T), employee, instance.unavail_employee, np.arange(T)])
+    visit_start = np.concatenate([instance.employee_start, start, instance.unavail_start, instance.employee_end])
+    visit_finish = np.concatenate([instance.employee_start, finish, instance.unavail_end, instance.employee_end])
+    visit_lat = np.concatenate([instance.employee_lat, instance.task_lat[task], instance.unavail_lat,
+                                instance.employee_lat])
+    visit_lon = np.concatenate([instance.employee_lon, instance.task_lon[task], instance.unavail_lon,
+                                instance.employee_lon])
+    visit_kind = np.concatenate([np.zeros(T), np.ones(len(task)), np.full(U, 2), np.full(T, 3)]).astype(int)
+    visit_label = np.concatenate([np.array(["home"] * T, dtype=object), task_ids[task],
+                                  np.array(["unavailability"] * U, dtype=object), np.array(["home"] * T, dtype=object)])
+    # departures from home first and returns last, then by start time
+    order = np.lexsort((visit_start, visit_kind == 3, visit_kind != 0, visit_employee))
+    visit_employee, visit_start, visit_finish = visit_employee[order], visit_start[order], visit_finish[order]
+    visit_lat, visit_lon, visit_kind, visit_label = visit_lat[order], visit_lon[order], visit_kind[order], visit_label[order]
+
+    # consecutive visits of the same employee
+    a, b = np.arange(len(order) - 1), np.arange(1, len(order))
+    same = visit_employee[a] == visit_employee[b]
+    a, b = a[same], b[same]
+    gap_employee = visit_employee[a]
+    distance = haversine(visit_lat[a], visit_lon[a], visit_lat[b], visit_lon[b])
+    travel = np.ceil(distance / SPEED)
+
+    # C10: the lunch break starts between 12 and 13 o'clock, in a gap between two visits
+    lunch = np.array([result.lunch_times.get(name, np.nan) for name in instance.employee_names], dtype=float)
+    for k in np.flatnonzero(np.isnan(lunch)):
+        report.add("C10", f"{instance.employee_names[k]} has no lunch break")
+    for k in np.flatnonzero((lunch < LUNCH_EARLIEST) | (lunch > LUNCH_LATEST)):
+        report.add("C10", f"lunch break of {instance.employee_names[k]} starts at {lunch[k]}")
+    lunch_in_gap = (lunch[gap_employee] >= visit_finish[a]) & (lunch[gap_employee] + LUNCH_DURATION <= visit_start[b])
+    has_lunch_gap = np.bincount(gap_employee, weights=lunch_in_gap, minlength=T) > 0
+    for k in np.flatnonzero(~has_lunch_gap & ~np.isnan(lunch)):
+        report.add("C10", f"lunch break of {instance.employee_names[k]} at {lunch[k]} overlaps a visit")
+
+    # C6, C9 and C12: enough time to travel between consecutive visits,
+    # the lunch break being taken either before leaving or after arriving
+    gap_lunch = lunch[gap_employee]
+    with_lunch = ((gap_lunch + LUNCH_DURATION + travel <= visit_start[b])
+                  | (visit_finish[a] + travel <= gap_lunch))
+    travel_ok = np.where(lunch_in_gap, with_lunch, visit_finish[a] + travel <= visit_start[b])
+    for g in np.flatnonzero(~travel_ok):
+        name = instance.employee_names[gap_employee[g]]
+        if visit_kind[a[g]] == 0:
+            report.add("C6", f"{name} cannot reach {visit_label[b[g]]} at {visit_start[b[g]]} after starting work")
+        elif visit_kind[b[g]] == 3:
+            report.add("C9", f"{name} cannot be home before the end of the day after {visit_label[a[g]]}")
+        else:
+            constraint = "C3" if 2 in (visit_kind[a[g]], visit_kind[b[g]]) else "C12"
+            report.add(constraint, f"{name} cannot go from {visit_label[a[g]]} (done at {visit_finish[a[g]]}) "
+                                   f"to {visit_label[b[g]]} (at {visit_start[b[g]]})")
+
+    # objective values
+    report.task_minutes = int(instance.task_duration[task].sum())
+    report.distance_km = float(distance.sum() / 1000)
+    return report
+
+
+def find_instance(result_path, data_directory="./data"):
+    """Find the instance of a result file from its name, e.g. SolutionUkraineV3byV3.txt -> InstanceUkraineV3.xlsx"""
+    match = re.match(r"Solution([A-Za-z]+?)V(\d)", os.path.basename(result_path))
+    if not match:
+        return None
+    name, version = match.groups()
+    candidates = glob.glob(os.path.join(data_directory, f"InstancesV{version}", f"Instance{name}V{version}.xlsx"))
+    return candidates[0] if candidates else None
+
+
+def _check_pair(pair):
+    instance_path, result_path = pair
+    try:
+        return check(instance_path, result_path)
+    except Exception as error:
+        report = CheckReport(instance_path, result_path)
+        report.add("input", f"{type(error).__name__}: {error}")
+        return report
+
+
+def check_directory(results_directory, data_directory="./data", workers=None):
+    """
+    Check every result file of a directory, and of its sub-directories, in parallel
+    :return: the list of CheckReport, result files whose instance is not found are skipped
+    """
+    result_paths = sorted(glob.glob(os.path.join(results_directory, "**", "*.txt"), recursive=True))
+    pairs = [(find_instance(path, data_directory), path) for path in result_paths]
+    pairs = [(instance_path, path) for instance_path, path in pairs if instance_path]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(_check_pair, pairs))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check result files against their instance")
+    parser.add_argument("instance", nargs="?", help="path of the instance file")
+    parser.add_argument("result", nargs="?", help="path of the result file")
+    parser.add_argument("--directory", help="check every result file of the directory")
+    parser.add_argument("--data", default="./data", help="directory of the instances, used with --directory")
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args(argv)
+
+    if args.directory:
+        reports = check_directory(args.directory, args.data, args.workers)
+    elif args.instance and args.result:
+        reports = [check(args.instance, args.result)]
+    else:
+        parser.error("give an instance and a result file, or --directory")
+    for report in reports:
+        print(report)
+    return 0 if all(report.feasible for report in reports) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
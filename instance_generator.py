@@ -0,0 +1,202 @@
+"""
+Generator of synthetic instances, in the format of the files of the data directory, for scaling tests.
+
+Usage:
+    python instance_generator.py ./data/Synthetic/Instance1000x.xlsx --employees 1700 --tasks 12600
+"""
+# module importation
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+DAY_START = 8 * 60  # 8:00am
+DAY_END = 18 * 60  # 6:00pm
+EARTH_RADIUS = 6371  # in km
+
+# task durations, in minutes, and their frequencies, close to those of the bundled instances
+DURATIONS = [30, 40, 45, 60, 90, 120, 180]
+DURATION_WEIGHTS = [0.15, 0.35, 0.25, 0.1, 0.07, 0.05, 0.03]
+
+
+def format_time(minutes):
+    """Format a number of minutes since midnight like the instance files do, e.g. 510 -> '8:30am'"""
+    hour, minute = divmod(int(minutes), 60)
+    suffix = "am" if hour < 12 else "pm"
+    return f"{(hour - 1) % 12 + 1}:{minute:02d}{suffix}"
+
+
+def round_quarter(minutes):
+    """Round times to the quarter of an hour, as in the bundled instances"""
+    return (np.asarray(minutes) / 15).round().astype(int) * 15
+
+
+def random_positions(rng, count, center, spread_km, clusters):
+    """
+    Draw positions around the center
+    :param center: (latitude, longitude) of the center of the area
+    :param spread_km: radius of the area in km
+    :param clusters: number of gaussian clusters the positions are drawn from, 0 for a uniform disk
+    :return: arrays of latitudes and longitudes
+    """
+    if clusters:
+        centers = random_positions(rng, clusters, center, spread_km, 0)
+        labels = rng.integers(clusters, size=count)
+        sigma = spread_km / np.sqrt(clusters) / 2
+        north = (centers[0][labels] - center[0]) * np.pi / 180 * EARTH_RADIUS + rng.normal(0, sigma, count)
+        east = ((centers[1][labels] - center[1]) * np.pi / 180 * EARTH_RADIUS * np.cos(np.radians(center[0]))
+                + rng.normal(0, sigma, count))
+    else:
+        radius = spread_km * np.sqrt(rng.random(count))
+        angle = rng.random(count) * 2 * np.pi
+        north, east = radius * np.sin(angle), radius * np.cos(angle)
+    latitude = center[0] + north / EARTH_RADIUS * 180 / np.pi
+    longitude = center[1] + east / (EARTH_RADIUS * np.cos(np.radians(center[0]))) * 180 / np.pi
+    return latitude, longitude
+
+
+def random_intervals(rng, owners, rate, min_length, max_length, start=DAY_START, end=DAY_END):
+    """
+    Draw disjoint intervals in the working day for each owner
+    :param rate: expected number of intervals per owner
+    :return: a list of (owner index, start, end)
+    """
+    intervals = []
+    for owner, count in zip(owners, rng.poisson(rate, len(owners))):
+        last_end = None
+        for s in np.sort(round_quarter(rng.uniform(start, end - min_length, count))):
+            if last_end is not None and s < last_end:
+                continue
+            e = min(int(s + round_quarter(rng.uniform(min_length, max_length))), end)
+            if e > s:
+                intervals.append((owner, int(s), e))
+                last_end = e
+    return intervals
+
+
+def generate_instance(n_employees, n_tasks, center=(49.5, 27.3), spread_km=60, clusters=0,
+                      window_tightness=0.0, level_weights=(0.4, 0.3, 0.3), employee_level_weights=None,
+                      employee_unavail_rate=0.2, task_unavail_rate=0.05, skill="Electricity", seed=0):
+    """
+    Generate a random instance.
+    :param n_employees: number of employees
+    :param n_tasks: number of tasks
+    :param center: (latitude, longitude) of the center of the area
+    :param spread_km: radius of the area, in km
+    :param clusters: number of clusters of tasks, 0 to spread them uniformly
+    :param window_tightness: 0 for tasks open the whole day, 1 for windows barely longer than the tasks
+    :param level_weights: probability of each skill level, starting with level 1, for tasks
+    :param employee_level_weights: same for employees, defaults to level_weights
+    :param employee_unavail_rate: expected number of unavailabilities per employee
+    :param task_unavail_rate: expected number of closed intervals per task
+    :param skill: skill of all employees and tasks
+    :param seed: seed of the random generator
+    :return: a dictionary of dataframes, one per sheet of the instance file
+    """
+    rng = np.random.default_rng(seed)
+    levels = np.arange(1, len(level_weights) + 1)
+    if employee_level_weights is None:
+        employee_level_weights = level_weights
+    level_weights = np.asarray(level_weights) / np.sum(level_weights)
+    employee_level_weights = np.asarray(employee_level_weights) / np.sum(employee_level_weights)
+
+    # employees
+    names = [f"E{k + 1}" for k in range(n_employees)]
+    latitude, longitude = random_positions(rng, n_employees, center, spread_km, 0)
+    employees = pd.DataFrame({
+        "EmployeeName": names,
+        "Latitude": latitude,
+        "Longitude": longitude,
+        "Skill": skill,
+        "Level": rng.choice(levels, n_employees, p=employee_level_weights),
+        "WorkingStartTime": format_time(DAY_START),
+        "WorkingEndTime": format_time(DAY_END),
+    })
+
+    # tasks, whose level never exceeds the highest level of the employees
+    task_ids = [f"T{i + 1}" for i in range(n_tasks)]
+    latitude, longitude = random_positions(rng, n_tasks, center, spread_km, clusters)
+    duration = rng.choice(DURATIONS, n_tasks, p=DURATION_WEIGHTS)
+    width = duration + (DAY_END - DAY_START - duration) * (1 - window_tightness * rng.random(n_tasks))
+    width = np.minimum(np.maximum(np.ceil(width / 15) * 15, duration), DAY_END - DAY_START)
+    opening = np.minimum(round_quarter(DAY_START + rng.random(n_tasks) * (DAY_END - DAY_START - width)),
+                         DAY_END - width)
+    tasks = pd.DataFrame({
+        "TaskId": task_ids,
+        "Latitude": latitude,
+        "Longitude": longitude,
+        "TaskDuration": duration,
+        "Skill": skill,
+        "Level": np.minimum(rng.choice(levels, n_tasks, p=level_weights), employees["Level"].max()),
+        "OpeningTime": [format_time(t) for t in opening],
+        "ClosingTime": [format_time(t) for t in opening + width],
+    })
+
+    # closed intervals of the tasks and unavailabilities of the employees
+    # the closed intervals are clipped to the opening window, as the loaders expect
+    task_unavails = [(i, max(s, int(opening[i])), min(e, int(opening[i] + width[i]))) for i, s, e in
+                     random_intervals(rng, range(n_tasks), task_unavail_rate, 30, 180)]
+    task_unavails = [(i, s, e) for i, s, e in task_unavails if e > s]
+    tasks_unavailabilities = pd.DataFrame({
+        "TaskId": [task_ids[i] for i, _, _ in task_unavails],
+        "Start": [format_time(s) for _, s, _ in task_unavails],
+        "End": [format_time(e) for _, _, e in task_unavails],
+    }, columns=["TaskId", "Start", "End"])
+
+    # unavailabilities are never in the lunch window, otherwise the employee could not have lunch
+    employee_unavails = [(k, s, e) for k, s, e in
+                         random_intervals(rng, range(n_employees), employee_unavail_rate, 15, 180,
+                                          end=DAY_END - 30)
+                         if e <= 12 * 60 or s >= 13 * 60]
+    # as in the bundled instances, the employees are unavailable at home
+    employees_unavailabilities = pd.DataFrame({
+        "EmployeeName": [names[k] for k, _, _ in employee_unavails],
+        "Latitude": [employees["Latitude"][k] for k, _, _ in employee_unavails],
+        "Longitude": [employees["Longitude"][k] for k, _, _ in employee_unavails],
+        "Start": [format_time(s) for _, s, _ in employee_unavails],
+        "End": [format_time(e) for _, _, e in employee_unavails],
+    }, columns=["EmployeeName", "Latitude", "Longitude", "Start", "End"])
+
+    return {
+        "Employees": employees,
+        "Employees Unavailabilities": employees_unavailabilities,
+        "Tasks": tasks,
+        "Tasks Unavailabilities": tasks_unavailabilities,
+    }
+
+
+def write_instance(path, sheets):
+    """Write the sheets returned by generate_instance into an Excel file readable by the loaders"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with pd.ExcelWriter(path) as writer:
+        for sheet_name, df in sheets.items():
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic instance for scaling tests")
+    parser.add_argument("path", help="path of the Excel file to write")
+    parser.add_argument("--employees", type=int, default=17)
+    parser.add_argument("--tasks", type=int, default=126)
+    parser.add_argument("--center", type=float, nargs=2, default=(49.5, 27.3), metavar=("LATITUDE", "LONGITUDE"))
+    parser.add_argument("--spread-km", type=float, default=60)
+    parser.add_argument("--clusters", type=int, default=0)
+    parser.add_argument("--window-tightness", type=float, default=0.0)
+    parser.add_argument("--level-weights", type=float, nargs="+", default=(0.4, 0.3, 0.3))
+    parser.add_argument("--employee-level-weights", type=float, nargs="+")
+    parser.add_argument("--employee-unavail-rate", type=float, default=0.2)
+    parser.add_argument("--task-unavail-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    sheets = generate_instance(args.employees, args.tasks, tuple(args.center), args.spread_km, args.clusters,
+                               args.window_tightness, args.level_weights, args.employee_level_weights,
+                               args.employee_unavail_rate, args.task_unavail_rate, seed=args.seed)
+    write_instance(args.path, sheets)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Instrumentation of the solvers: per-phase timers, counters and events sent to pluggable sinks.
+Nothing is recorded unless a session is open, so the hooks left in the solvers cost a flag check.
+
+Usage from code:
+    with Instrumentation.session(MemorySink(), JsonLinesSink("run.jsonl"), profile="run.prof"):
+        GreedySolution().optimize_simultaneous()
+
+Usage from the command line:
+    python instrumentation.py ./data/InstancesV3/InstanceUkraineV3.xlsx --solver tabu --jsonl run.jsonl
+"""
+# module importation
+import argparse
+import cProfile
+import functools
+import io
+import json
+import pstats
+import time
+from contextlib import contextmanager
+
+
+class MemorySink:
+    """Keep the records in a list"""
+
+    def __init__(self):
+        self.records = []
+
+    def write(self, record):
+        self.records.append(record)
+
+    def close(self):
+        pass
+
+
+class JsonLinesSink:
+    """Write one JSON object per record in a file"""
+
+    def __init__(self, path):
+        self.file = open(path, "w")
+
+    def write(self, record):
+        self.file.write(json.dumps(record, default=float) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class _Timer:
+    """Context manager adding the elapsed time to a phase of the instrumentation"""
+    __slots__ = ["phase", "tic"]
+
+    def __init__(self, phase):
+        self.phase = phase
+
+    def __enter__(self):
+        self.tic = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        Instrumentation.add_time(self.phase, time.perf_counter() - self.tic)
+
+
+class _NullTimer:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+_null_timer = _NullTimer()
+
+
+class Instrumentation:
+    enabled = False  # whether a session is open
+    timers = {}  # phase -> [number of calls, total time in seconds], nested phases are included in their parent
+    counters = {}  # counter name -> value
+    sinks = []
+
+    @classmethod
+    def timer(cls, phase: str):
+        """Return a context manager timing the enclosed code as the given phase"""
+        return _Timer(phase) if cls.enabled else _null_timer
+
+    @classmethod
+    def timed(cls, phase: str, counter: str = None):
+        """Decorator timing every call of the function as the given phase, and counting the calls if asked"""
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not cls.enabled:
+                    return function(*args, **kwargs)
+                if counter:
+                    cls.count(counter)
+                with _Timer(phase):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @classmethod
+    def add_time(cls, phase: str, seconds: float):
+        entry = cls.timers.setdefault(phase, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    @classmethod
+    def count(cls, counter: str, value=1):
+        if cls.enabled:
+            cls.counters[counter] = cls.counters.get(counter, 0) + value
+
+    @classmethod
+    def event(cls, name: str, **data):
+        """Send a record to every sink, e.g. the objective values at each iteration of the tabu search"""
+        if cls.enabled:
+            record = {"type": "event", "name": name, "time": time.time()}
+            record.update(data)
+            for sink in cls.sinks:
+                sink.write(record)
+
+    @classmethod
+    def summary(cls):
+        """Return the timers and counters recorded so far"""
+        return {"type": "summary",
+                "timers": {phase: {"calls": calls, "seconds": seconds} for phase, (calls, seconds) in cls.timers.items()},
+                "counters": dict(cls.counters)}
+
+    @classmethod
+    @contextmanager
+    def session(cls, *sinks, profile=None, profile_top=20):
+        """
+        Record timers, counters and events while the context is open.
+        The summary is sent to the sinks when the context exits.
+        :param sinks: objects with write(record) and close() methods, e.g. MemorySink or JsonLinesSink
+        :param profile: path where the cProfile statistics are dumped, None to run without cProfile
+        :param profile_top: number of functions, by cumulative time, sent to the sinks as a profile record
+        """
+        cls.timers, cls.counters, cls.sinks = {}, {}, list(sinks)
+        cls.enabled = True
+        profiler = cProfile.Profile() if profile else None
+        if profiler:
+            profiler.enable()
+        try:
+            yield cls
+        finally:
+            if profiler:
+                profiler.disable()
+                profiler.dump_stats(profile)
+                stream = io.StringIO()
+                pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(profile_top)
+                for sink in cls.sinks:
+                    sink.write({"type": "profile", "path": profile, "stats": stream.getvalue()})
+            summary = cls.summary()
+            for sink in cls.sinks:
+                sink.write(summary)
+                sink.close()
+            cls.enabled = False
+            cls.sinks = []
+
+
+def print_summary(summary):
+    print(f"{'phase':<28}{'calls':>10}{'seconds':>12}")
+    for phase, entry in sorted(summary["timers"].items(), key=lambda item: -item[1]["seconds"]):
+        print(f"{phase:<28}{entry['calls']:>10}{entry['seconds']:>12.4f}")
+    print(f"{'counter':<28}{'value':>10}")
+    for counter, value in sorted(summary["counters"].items()):
+        print(f"{counter:<28}{value:>10}")
+
+
+def main(argv=None):
+    # imported here because the solvers themselves import this module; when run as a script, this module is
+    # __main__ and the solvers record into the Instrumentation class of the imported instrumentation module
+    import benchmark
+    import models_v3_tabu
+    from instrumentation import Instrumentation, MemorySink, JsonLinesSink
+
+    parser = argparse.ArgumentParser(description="Solve an instance and report where the time goes")
+    parser.add_argument("instance", help="path of the instance file")
+    parser.add_argument("--solver", default="greedy_simultaneous", choices=list(benchmark.SOLVERS))
+    parser.add_argument("--jsonl", help="path of the JSON lines file receiving the records")
+    parser.add_argument("--profile", help="path where the cProfile statistics are dumped")
+    args = parser.parse_args(argv)
+
+    memory = MemorySink()
+    sinks = [memory] + ([JsonLinesSink(args.jsonl)] if args.jsonl else [])
+    with Instrumentation.session(*sinks, profile=args.profile):
+        models_v3_tabu.load_data_from_path(args.instance)
+        benchmark.SOLVERS[args.solver]()
+    print_summary(memory.records[-1])
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,16 @@
 # basic modules
-import pandas as pd
 import numpy as np
 from datetime import datetime
 from math import radians, cos, sin, asin, sqrt
 from utils import parse_time, parse_time_minute
 
 
+def read_sheet(path, sheet_name):
+    """Read a sheet of an instance file into a dataframe"""
+    import pandas as pd  # only needed to read the instance files, not by the solvers
+    return pd.read_excel(path, sheet_name=sheet_name)
+
+
 class Employee:
     list = []  # list of all employee instances
     count = 0  # employee count, i.e. the length of Employee.list
@@ -65,7 +70,7 @@ class Employee:
             cls.list = []
 
         # loading data into pandas dataframes
-        df_employees = pd.read_excel(path, sheet_name="Employees")
+        df_employees = read_sheet(path, "Employees")
         df_employees.set_index("EmployeeName")
 
         # instantiation of employee instances
@@ -104,7 +109,9 @@ class Employee:
 class Node:
     list = []
     count = 0
-    distance: np.array = None
+    distance: np.array = None  # dense matrix, or SparseDistance for large instances, read as distance[i, j]
+    dense_limit = 10000  # number of nodes above which only the nearest neighbours are stored
+    k_nearest = 32  # number of neighbours stored per node by SparseDistance
     __is_initialized = False  # whether the distance matrix is initialized
 
     def __init__(self):
@@ -144,10 +151,21 @@ class Node:
         return c * r
 
     @classmethod
-    def initialize_distance(cls):
+    def initialize_distance(cls, sparse=None):
+        """
+        Calculate the distances between the nodes
+        :param sparse: whether to store only the k_nearest neighbours of each node (SparseDistance) instead of the
+        dense matrix, defaults to True above dense_limit nodes
+        """
         if cls.__is_initialized:
             print("Warning: trying to reinitialize an initialized task list, recalculating the distance matrix")
         cls.__is_initialized = True
+        if sparse is None:
+            sparse = cls.count > cls.dense_limit
+        if sparse:
+            from sparse_distance import SparseDistance
+            cls.distance = SparseDistance(cls.list, cls.k_nearest)
+            return
         cls.distance = np.zeros((cls.count, cls.count), dtype=np.float64)
 
         for i in range(cls.count):
@@ -155,6 +173,40 @@ class Node:
                 node_i, node_j = cls.list[i], cls.list[j]
                 cls.distance[i, j] = cls.distance[j, i] = cls.calculate_distance(node_i, node_j)
 
+    @classmethod
+    def set_distance(cls, distance):
+        """Use distances calculated elsewhere, e.g. attached from shared memory, read as distance[i, j]"""
+        cls.__is_initialized = True
+        cls.distance = distance
+
+    @classmethod
+    def open_for_update(cls):
+        """Allow new nodes to be instantiated after the distance matrix was calculated"""
+        cls.__is_initialized = False
+
+    @classmethod
+    def update_distance(cls, previous_list, previous_distance):
+        """
+        Recalculate the distance matrix after nodes have been added to, removed from or reordered in Node.list.
+        Distances between nodes already present in previous_list are copied instead of being recalculated.
+        :param previous_list: the node list for which previous_distance was calculated
+        :param previous_distance: the distance matrix of previous_list
+        """
+        cls.__is_initialized = True
+        if not isinstance(previous_distance, np.ndarray):  # sparse distances are cheap to rebuild
+            from sparse_distance import SparseDistance
+            cls.distance = SparseDistance(cls.list, previous_distance.k, previous_distance.cache_size)
+            return
+        previous_position = {id(node): idx for idx, node in enumerate(previous_list)}
+        old_idx = np.array([previous_position.get(id(node), -1) for node in cls.list], dtype=np.int64)
+        kept = np.flatnonzero(old_idx >= 0)
+
+        cls.distance = np.zeros((cls.count, cls.count), dtype=np.float64)
+        cls.distance[np.ix_(kept, kept)] = previous_distance[np.ix_(old_idx[kept], old_idx[kept])]
+        for i in np.flatnonzero(old_idx < 0):
+            for j in range(cls.count):
+                cls.distance[i, j] = cls.distance[j, i] = cls.calculate_distance(cls.list[i], cls.list[j])
+
     @classmethod
     def load_excel(cls, path):
         pass
@@ -210,7 +262,7 @@ class Task(Node):
             cls.count = 0
 
         # load tasks
-        df = pd.read_excel(path, sheet_name="Tasks")
+        df = read_sheet(path, "Tasks")
         df.set_index("TaskId")
         for index, row in df.iterrows():
             # parse the start time and end time into datetime object
@@ -226,7 +278,7 @@ class Task(Node):
                 closing_time)
 
         # load task unavailabilities
-        df_unavail = pd.read_excel(path, sheet_name="Tasks Unavailabilities")
+        df_unavail = read_sheet(path, "Tasks Unavailabilities")
         df_unavail.set_index("TaskId")
         for _, row in df_unavail.iterrows():
             task = cls.find_by_id(row["TaskId"])
@@ -265,7 +317,7 @@ class Home(Node):
         if cls.count:
             cls.list = []
             cls.count = 0
-        df_employees = pd.read_excel(path, sheet_name="Employees")
+        df_employees = read_sheet(path, "Employees")
         df_employees.set_index("EmployeeName")
         for _, row in df_employees.iterrows():
             cls(row["EmployeeName"], row["Latitude"], row["Longitude"])
@@ -303,7 +355,7 @@ class Unavail(Node):
             cls.list = []
             cls.count = 0
         # create a task for each unavailability at the bottom of the list
-        df_employees_unavailabilities = pd.read_excel(path, sheet_name="Employees Unavailabilities")
+        df_employees_unavailabilities = read_sheet(path, "Employees Unavailabilities")
         df_employees_unavailabilities.set_index("EmployeeName")
 
         for _, row in df_employees_unavailabilities.iterrows():
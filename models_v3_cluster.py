@@ -0,0 +1,196 @@
+# module importation
+import numpy as np
+from math import ceil
+
+# model classes for employees and nodes
+from models_v2 import Employee, Node, Task, Home, Unavail
+import models_v3_greedy
+
+
+def cluster_nodes(random_state=0):
+    """
+    Split the nodes into spatial clusters of about ten tasks each
+    :return: the label of the cluster of each node
+    """
+    from sklearn.cluster import SpectralClustering  # optional dependency, only needed by this solver
+
+    points = [[node.longitude, node.latitude] for node in Node.list]
+    # on choisi un nombre de cluster qui nous permet d'avoir en moyenne une dizaine de tâches par cluster
+    numb_of_clust = int(Task.count / 10) + 1
+    clustering = SpectralClustering(n_clusters=numb_of_clust, assign_labels='discretize',
+                                    random_state=random_state).fit(points)
+    return clustering.labels_
+
+
+def solve_cluster_mip(time_limit_per_employee=15, random_state=0):
+    """
+    Solve the currently loaded instance by clustering the nodes and solving the MIP of phase II in each cluster
+    containing at least one employee.
+    :param time_limit_per_employee: Gurobi time limit, in seconds, per employee of the cluster
+    :param random_state: seed of the spectral clustering
+    :return: (Z, B, lunch_times, total task time, total distance in meter)
+    """
+    from gurobipy import Model, GRB, quicksum  # optional dependency, only needed by this solver
+
+    homes = models_v3_greedy.homes
+    tasks = models_v3_greedy.tasks
+    unavails = models_v3_greedy.unavails
+    labels = cluster_nodes(random_state)
+
+    dist = []
+    task_time = []
+    Z = {}
+    lunch_times = {}
+    B_res = {}
+    for lab in np.unique(labels):
+        # les listes homes_clust, tasks_clust et unavails_clust contiennent les indices des employés,
+        # des taches et des indisponibilités présent dans le cluster
+        homes_clust = [home for home in homes if labels[home] == lab]
+        if not homes_clust:
+            continue
+        tasks_clust = [task for task in tasks if labels[task] == lab]
+        unavails_clust = [unavail for unavail in unavails if labels[unavail] == lab]
+        nodes_clust = homes_clust + tasks_clust + unavails_clust
+
+        m = Model("DB")
+        m.params.outputflag = 0
+
+        # an arbitrarily big variable
+        M = 1000000
+
+        # decision variables
+        X = {(i, j): m.addVar(vtype=GRB.BINARY, name=f'x{i}_{j}') for i in nodes_clust for j in nodes_clust if i != j}
+        Y = {(k, i): m.addVar(vtype=GRB.BINARY, name=f'y{k}_{i}') for k in homes_clust for i in nodes_clust}
+        B = {i: m.addVar(vtype=GRB.INTEGER, name=f'b{i}', lb=0, ub=24 * 60) for i in nodes_clust}
+        L = {(k, i): m.addVar(vtype=GRB.BINARY) for k in homes_clust for i in nodes_clust}
+        P = {k: m.addVar(vtype=GRB.INTEGER, lb=12 * 60, ub=13 * 60) for k in homes_clust}
+        t = {(i, l): m.addVar(vtype=GRB.BINARY, name=f't{l}') for i in tasks_clust
+             for l in range(len(Node.list[i].open_intervals()))}
+
+        # C1
+        for i in nodes_clust:
+            m.addConstr(quicksum([X[(i, j)] for j in nodes_clust if i != j]) == quicksum(
+                [X[(j, i)] for j in nodes_clust if i != j]))
+
+        # C2
+        for j in homes_clust + tasks_clust:
+            m.addConstr(quicksum([X[(i, j)] for i in nodes_clust if i != j]) <= 1)
+
+        # C3_a
+        for j in unavails_clust:
+            m.addConstr(quicksum([X[(i, j)] for i in nodes_clust if i != j]) == 1)
+
+        # C3_b
+        for i in homes_clust + unavails_clust:
+            employee = Node.list[i].employee
+            for k in homes_clust:
+                if employee == Employee.list[k]:
+                    m.addConstr(Y[(k, i)] == 1)
+                else:
+                    m.addConstr(Y[(k, i)] == 0)
+
+        # C4
+        for i in nodes_clust:
+            for j in nodes_clust:
+                if i != j:
+                    for k in homes_clust:
+                        m.addConstr(Y[(k, i)] <= Y[(k, j)] + 1 - X[(i, j)])
+                        m.addConstr(Y[(k, i)] >= Y[(k, j)] - 1 + X[(i, j)])
+
+        # C5
+        for i in tasks_clust:
+            m.addConstr(B[i] >= Node.list[i].opening_time)
+            m.addConstr(Node.list[i].duration + B[i] <= Node.list[i].closing_time)
+
+        # C6_a
+        for k in homes_clust:
+            m.addConstr(B[k] >= Employee.list[k].start_time)
+
+        # C6_b
+        for i in unavails_clust:
+            m.addConstr(B[i] == Node.list[i].opening_time)
+
+        # C7
+        for i in tasks_clust:
+            intervals = Node.list[i].open_intervals()
+            m.addConstr(quicksum([t[(i, l)] for l in range(len(intervals))]) == quicksum(
+                [X[(i, j)] for j in nodes_clust if i != j]))
+            for l in range(len(intervals)):
+                start, end = intervals[l]
+                m.addConstr(B[i] >= start - (1 - t[(i, l)]) * M)
+                m.addConstr(B[i] + Node.list[i].duration <= end + (1 - t[(i, l)]) * M)
+
+        # C8
+        for k in homes_clust:
+            m.addConstr(B[k] <= P[k])
+            for i in tasks_clust + unavails_clust:
+                m.addConstr(B[k] + ceil(Node.distance[k, i] / Employee.speed) - (1 - X[(k, i)]) * M <= B[i])
+                m.addConstr(
+                    P[k] + 60 + ceil(Node.distance[k, i] / Employee.speed) - (2 - X[(k, i)] - L[(k, k)]) * M <= B[i])
+
+        # C9
+        for k in homes_clust:
+            for i in tasks_clust + unavails_clust:
+                m.addConstr(B[i] + Node.list[i].duration + ceil(Node.distance[i, k] / Employee.speed)
+                            <= Employee.list[k].end_time + M * (1 - X[(i, k)]))
+                m.addConstr(B[i] + Node.list[i].duration <= P[k] + M * (2 - L[(k, i)] - X[(i, k)]))
+                m.addConstr(P[k] + 60 + Node.list[i].duration + ceil(Node.distance[i, k] / Employee.speed)
+                            <= Employee.list[k].end_time + M * (2 - X[(i, k)] - L[(k, i)]))
+
+        # C10_a
+        for k in homes_clust:
+            m.addConstr(quicksum([L[(k, i)] for i in nodes_clust]) == 1)
+
+        # C10_b
+        for k in homes_clust:
+            for i in nodes_clust:
+                m.addConstr(Y[(k, i)] >= L[(k, i)])
+
+        # C11
+        for i in tasks_clust + unavails_clust:
+            m.addConstr(quicksum([Y[(k, i)] for k in homes_clust]) <= quicksum(
+                [X[(j, i)] for j in nodes_clust if j != i]))
+
+        # C12
+        for i in tasks_clust + unavails_clust:
+            for j in tasks_clust + unavails_clust:
+                if i != j:
+                    pause_en_i = quicksum([L[(k, i)] for k in homes_clust])
+                    m.addConstr(B[i] + Node.list[i].duration + ceil(Node.distance[i, j] / Employee.speed)
+                                <= B[j] + M * (1 - X[(i, j)]))
+                    m.addConstr(B[i] + Node.list[i].duration <= P[k] + M * (2 - X[(i, j)] - pause_en_i))
+                    m.addConstr(P[k] + 60 + Node.list[i].duration + ceil(Node.distance[i, j] / Employee.speed)
+                                <= B[j] + M * (2 - X[(i, j)] - pause_en_i))
+
+        # C13
+        for k in homes_clust:
+            for i in tasks_clust:
+                m.addConstr(Employee.list[k].level >= Node.list[i].level - M * (1 - Y[(k, i)]))
+
+        obj = quicksum([X[(i, j)] * Node.list[j].duration for i in nodes_clust for j in tasks_clust if i != j])
+        total_dist = quicksum([Node.distance[i, j] * X[(i, j)] for i in nodes_clust for j in nodes_clust if i != j])
+        # on accorde pour chaque cluster un temps de résolution proportionnel au nombre d'employé dans le cluster
+        m.setParam('TimeLimit', time_limit_per_employee * len(homes_clust))
+        m.setObjective(obj - total_dist / 1000, GRB.MAXIMIZE)
+        m.update()
+        m.optimize()
+        if m.SolCount == 0:
+            continue
+        dist.append(total_dist.getValue())
+        task_time.append(obj.getValue())
+
+        for i in nodes_clust:
+            for k in homes_clust:
+                if Y[(k, i)].x > 0.5:
+                    Z[i] = k
+        for k in homes_clust:
+            for i in nodes_clust:
+                if L[(k, i)].x > 0.5:
+                    if Node.list[i].node_type != 'home':
+                        lunch_times[k] = B[i].x + Node.list[i].duration
+                    else:
+                        lunch_times[k] = B[i].x
+        for i in nodes_clust:
+            B_res[i] = B[i].x
+
+    return Z, B_res, lunch_times, sum(task_time), sum(dist)
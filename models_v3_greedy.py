@@ -1,29 +1,39 @@
 # module importation
 import numpy as np
 from math import ceil
-import matplotlib.pyplot as plt
 
 # utilities
 from utils import *
+from instrumentation import Instrumentation
 import random as rd
 from copy import deepcopy
 
 # model classes for employees and nodes
 from models_v2 import Employee, Node, Task, Home, Unavail
+from neighbor_graph import NeighborGraph
 
 W = U = T = V = 0
 employees = homes = tasks = unavails = nodes = []
 
-def load_data_from_path(path_to_instance: str):
-    # load employee data
-    Employee.load_excel(path_to_instance)
-
-    # load node data
-    Node.clear_previous_data()
-    for cls in [Home, Task, Unavail]:
-        cls.load_excel(path_to_instance)
-    Node.initialize_distance()
-
+def load_data_from_path(path_to_instance: str, sparse=None):
+    """
+    Load an instance and calculate its distances
+    :param sparse: whether to store only the nearest neighbours of each node, see Node.initialize_distance
+    """
+    with Instrumentation.timer("load"):
+        # load employee data
+        Employee.load_excel(path_to_instance)
+
+        # load node data
+        Node.clear_previous_data()
+        for cls in [Home, Task, Unavail]:
+            cls.load_excel(path_to_instance)
+    with Instrumentation.timer("distance_matrix"):
+        Node.initialize_distance(sparse)
+    update_indices()
+
+def update_indices():
+    """Recompute the constants and indices from the counts of the currently loaded nodes"""
     # constants
     global W, U, T, V
     (W, U, T, V) = (Task.count, Unavail.count, Employee.count, Node.count)
@@ -35,9 +45,7 @@ def load_data_from_path(path_to_instance: str):
     tasks = list(range(T, T + W))
     unavails = list((range(T + W, V)))
     nodes = list(range(V))
-    
-path_to_test = path_bordeaux_v2 = "./data/InstancesV3/InstanceUkraineV3.xlsx"
-load_data_from_path(path_to_test)
+    NeighborGraph.clear()
 
 def index_to_employee(employee_idx):
     employee : Employee = Employee.list[employee_idx]
@@ -104,12 +112,28 @@ class GreedySolution:
         return ceil(Node.distance[self.employee_last_node(employee_idx), node_idx] / Employee.speed)
 
     def employee_closest_task(self, employee_idx, before_one=False):
+        """
+        Find the task the employee can start the earliest after their last node, among the successors of the last
+        node in the neighbour graph first, then among all the unvisited tasks if none of them fits
+        :return: (index of the task or None, start time of the task)
+        """
+        graph = NeighborGraph.get()
+        if graph is not None:
+            successors = [node_idx for node_idx in graph.successors[self.employee_last_node(employee_idx)]
+                          if self.node_begin_time[node_idx] is None]
+            res, task_start_time = self.employee_earliest_task(employee_idx, successors, before_one)
+            if res is not None:
+                return res, task_start_time
+        unvisited_tasks = [node_idx for node_idx in self.unvisited_nodes if index_to_node(node_idx).node_type == "task"]
+        return self.employee_earliest_task(employee_idx, unvisited_tasks, before_one)
+
+    def employee_earliest_task(self, employee_idx, candidate_tasks, before_one=False):
         employee: Employee = Employee.list[employee_idx]
-        unvisited_tasks = filter(lambda node_idx: index_to_node(node_idx).node_type == "task", self.unvisited_nodes)
+        Instrumentation.count("candidates", len(candidate_tasks))
         res = None
         task_start_time = float("inf")
 
-        for node_idx in unvisited_tasks:
+        for node_idx in candidate_tasks:
             node: Task = Node.list[node_idx]
             if node.level > employee.level:
                 continue
@@ -144,6 +168,7 @@ class GreedySolution:
         unavail: Unavail = Node.list[obstacle_idx]
         return arrival_time <= unavail.opening_time
 
+    @Instrumentation.timed("construction")
     def optimize_employee_by_employee(self):
 
         def is_lunch_time(employee_idx):
@@ -219,6 +244,7 @@ class GreedySolution:
                 employee_visit_next_obstacle(employee_idx)
         return self
 
+    @Instrumentation.timed("construction")
     def optimize_simultaneous(self):
 
         def pick_employee():
@@ -297,6 +323,28 @@ class GreedySolution:
 
         return self
 
+    def resequence(self, max_stops=12):
+        """
+        Reorder the nodes of each route optimally, see resequencing.py, keeping the new order when it travels less
+        :param max_stops: routes with more nodes are left unchanged
+        """
+        # imported here as resequencing imports this module through replanning
+        from resequencing import resequence
+
+        for k in employees:
+            route = [k] + self.employee_node_lists[k][:-1]
+            sequence = resequence(route, max_stops)
+            if sequence is None:
+                continue
+            distance = sum(Node.distance[prev, curr] for prev, curr in zip(route, route[1:] + route[:1]))
+            if sequence.distance < distance - 1e-6:
+                self.employee_node_lists[k] = sequence.route[1:] + [k]
+                for v, begin in zip(sequence.route[1:], sequence.begin_times):
+                    self.node_begin_time[v] = begin
+                self.node_begin_time[k] = sequence.return_time
+                self.employee_lunch_time[k] = sequence.lunch_time
+        return self
+
     def calculate_time(self):
         """calculate the total time spent on work"""
         def index_is_task(node_idx):
@@ -325,45 +373,19 @@ class GreedySolution:
         return sum(calculate_employee_distance(employee_idx) for employee_idx in employees)
 
 
-    def plot_solution(self, marker=True):
-        plt.figure(figsize=(cm_to_inch(100), cm_to_inch(100)))
-        node_pos = []
-        for employee in Employee.list:
-            node_pos.append([employee.longitude, employee.latitude])
-            rd_color = "#" + ''.join([rd.choice('0123456789ABCDEF') for _ in range(6)])
-            if marker:
-                plt.scatter([employee.longitude], [employee.latitude], label=f"Maison de {employee.name}", c=rd_color,
-                    marker="$(H)$", s=800)
-            else:
-                plt.scatter([employee.longitude], [employee.latitude], label=f"Maison de {employee.name}", c=rd_color, s=1000)
-
-        # all_indexes = employees + tasks + unavails
-        for i in tasks:
-            task = Node.list[i]
-            node_pos.append([task.longitude, task.latitude])
-            if marker:
-                plt.scatter([task.longitude], [task.latitude], marker = f"$({task.id})$", s = 800)
-            else:
-                plt.scatter([task.longitude], [task.latitude], s = 4)
-
-        for i in unavails:
-            unavail = Node.list[i]
-            node_pos.append([unavail.longitude, unavail.latitude])
-            if marker:
-                plt.scatter([unavail.longitude], [unavail.latitude],
-                    marker=f"$(X {unavail.employee.name})$", s=1000)
-            else:
-                plt.scatter([unavail.longitude], [unavail.latitude], s=4)
-
-        color_map = plt.cm.get_cmap("hsv", T)
+    def plot_solution(self, marker=True, path=None):
+        """
+        Draw the routes of the employees
+        :param marker: write the id of each task next to it
+        :param path: file where the map is written (.png, .svg, ...), None to show it
+        """
+        edges = []
+        Z = {}
         for employee_idx in employees:
-            clr = color_map(employee_idx) # one color per employee
-            lbl = index_to_employee(employee_idx).name
-            node_idx_prev = employee_idx # employee's home
+            node_idx_prev = employee_idx  # employee's home
+            Z[employee_idx] = employee_idx
             for node_idx_curr in self.employee_node_lists[employee_idx]:
-                plt.plot([node_pos[node_idx_prev][0], node_pos[node_idx_curr][0]],
-                         [node_pos[node_idx_prev][1], node_pos[node_idx_curr][1]], c= clr)
+                edges.append((node_idx_prev, node_idx_curr))
+                Z[node_idx_curr] = employee_idx
                 node_idx_prev = node_idx_curr
-
-        plt.legend(prop={'size': 40},loc='center left', bbox_to_anchor=(1, 0.5))
-        plt.show()
\ No newline at end of file
+        return plot_routes(Employee.list, Node.list, tasks, unavails, edges, Z, path=path, marker=marker)
\ No newline at end of file
@@ -0,0 +1,958 @@
+# module importation
+from math import ceil
+import itertools
+import sys
+import time
+
+# utilities
+from utils import *
+from instrumentation import Instrumentation
+from collections import OrderedDict
+
+# model classes for employees and nodes
+from models_v2 import Employee, Node, Task, Home, Unavail
+import models_v3_greedy
+from models_v3_greedy import GreedySolution
+from bounds import compute_bounds
+from neighbor_graph import NeighborGraph
+
+W = U = T = V = 0
+employees = homes = tasks = unavails = nodes = []
+
+
+class RouteEvaluation:
+    '''Résultat de la validation et de l'évaluation d'une route seule'''
+    __slots__ = ["feasible", "task_minutes", "distance"]
+
+    def __init__(self, feasible, task_minutes, distance):
+        self.feasible = feasible  # la route passe Solution(add_time(simple_sol(route))).validate()
+        self.task_minutes = task_minutes
+        self.distance = distance  # en mètres
+
+
+class RouteCache:
+    '''Cache LRU des évaluations de routes, indexé par le tuple des sommets de la route.
+    Partagé par local_neighbor_adding, local_neighbor_switching et les voisinages d'échange et de suppression,
+    il évite de valider à nouveau les routes qui réapparaissent d'une itération à l'autre.
+    Il est vidé à chaque chargement d'instance.'''
+    max_memory = 64 * 1024 * 1024  # taille maximale du cache, en octets
+    entries = OrderedDict()
+    memory = 0  # taille des entrées
+    hits = 0
+    misses = 0
+
+    @classmethod
+    def set_max_memory(cls, max_memory: int):
+        '''Fixe la taille maximale du cache en octets, 0 pour le désactiver'''
+        cls.max_memory = max_memory
+        cls._evict()
+
+    @classmethod
+    def clear(cls):
+        cls.entries = OrderedDict()
+        cls.memory = 0
+        cls.hits = cls.misses = 0
+
+    # emplacement d'une entrée dans la table de hachage et maillon de la liste chaînée de l'OrderedDict
+    entry_overhead = 100
+
+    @classmethod
+    def entry_size(cls, key, evaluation):
+        '''Mémoire occupée par l'entrée d'une route : le tuple de la clé, l'évaluation et ses deux nombres.
+        Les sommets de la clé sont des entiers partagés avec les routes et ne sont pas comptés'''
+        return (cls.entry_overhead + sys.getsizeof(key) + sys.getsizeof(evaluation)
+                + sys.getsizeof(evaluation.task_minutes) + sys.getsizeof(evaluation.distance))
+
+    @classmethod
+    def get(cls, route):
+        '''Renvoie l'évaluation (RouteEvaluation) de la route, calculée si elle n'est pas dans le cache'''
+        key = tuple(route)
+        evaluation = cls.entries.get(key)
+        if evaluation is not None:
+            cls.entries.move_to_end(key)
+            cls.hits += 1
+            Instrumentation.count("route_cache_hits")
+            return evaluation
+        cls.misses += 1
+        Instrumentation.count("route_cache_misses")
+        evaluation = cls.evaluate(list(route))
+        if cls.max_memory > 0:
+            cls.entries[key] = evaluation
+            cls.memory += cls.entry_size(key, evaluation)
+            cls._evict()
+        return evaluation
+
+    @classmethod
+    def feasible(cls, route):
+        return cls.get(route).feasible
+
+    @classmethod
+    def objectives(cls, route):
+        '''Valeurs des fonctions objectifs de la route seule, comme evaluate({route[0] : route}).
+        Une route absente du cache n'y est pas ajoutée, l'évaluer coûte moins cher que la valider'''
+        evaluation = cls.entries.get(tuple(route))
+        if evaluation is None:
+            return evaluate({route[0] : route})
+        return (evaluation.task_minutes, evaluation.distance)
+
+    @staticmethod
+    def evaluate(route):
+        k = route[0]
+        sol = Solution(add_time(simple_sol(route)))
+        feasible = sol.validate()
+        task_minutes, distance = evaluate({k : route})
+        return RouteEvaluation(feasible, task_minutes, distance)
+
+    @classmethod
+    def _evict(cls):
+        while cls.entries and cls.memory > cls.max_memory:
+            key, evaluation = cls.entries.popitem(last=False)
+            cls.memory -= cls.entry_size(key, evaluation)
+
+def update_indices():
+    """Copy the constants and indices of the instance currently loaded in models_v3_greedy"""
+    global W, U, T, V
+    (W, U, T, V) = (models_v3_greedy.W, models_v3_greedy.U, models_v3_greedy.T, models_v3_greedy.V)
+
+    global employees, homes, tasks, unavails, nodes
+    employees = models_v3_greedy.employees
+    homes = models_v3_greedy.homes
+    tasks = models_v3_greedy.tasks
+    unavails = models_v3_greedy.unavails
+    nodes = models_v3_greedy.nodes
+    RouteCache.clear()
+
+def load_data_from_path(path_to_instance: str, sparse=None):
+    models_v3_greedy.load_data_from_path(path_to_instance, sparse)
+    update_indices()
+
+def temps(v1,v2):
+    '''Donne le temps de trajet entre les sommets v1 et v2'''
+    return ceil(Node.distance[v1,v2]/Employee.speed)
+
+update_indices()
+
+
+class Operation:
+    '''Défni la classe des opération permettant d'atteindre une solution'''
+    def __init__(self,type,node=-1,employee1=-1,employee2=-1):
+        self.type = type
+        self.node = node
+        self.employee1 = employee1
+        self.employee2 = employee2
+
+    def copy(self):
+        """Return a copy of the instance"""
+        return Operation(self.type, self.node, self.employee1, self.employee2)
+
+
+class Solution:
+    print_warning = True  # whether to print warning or not when validating
+
+    def __init__(self,chemins):
+        self.list = chemins
+        self.lunch_times = {}
+
+    @classmethod
+    def set_warning(cls, print_warning: bool):
+        """set whether to print warning when validating data"""
+        cls.print_warning = print_warning
+
+    @classmethod
+    def warn(cls, warning: str, print_color="yellow"):
+        """
+        Print a text in yellow if print_warning set to True
+        :param warning: the warning message we want to print
+        :param print_color: the color of the printed message, defaulted to yellow
+        """
+        if not cls.print_warning: return # does nothing if print_warning set to False
+        correspondance = {
+            "yellow": Colors.WARNING,
+            "cyan": Colors.CYAN,
+            "green": Colors.GREEN,
+            "red": Colors.FAIL
+        }
+        color = correspondance[print_color] if print_color in correspondance.keys() else Colors.WARNING
+        print(f"{color}Error: {warning}{Colors.NORMAL}")
+
+    def copy(self):
+        """Return a copy of the instance sharing no mutable data with it, validate modifying the time windows"""
+        if isinstance(self.list, str):
+            sol = Solution(self.list)
+        else:
+            sol = Solution({k: {v: list(window) for v, window in timed.items()} for k, timed in self.list.items()})
+        sol.lunch_times = dict(self.lunch_times)
+        return sol
+
+    def validate_format(self):
+        """Verify that Solution and margin have the right format"""
+        if type(self.list) == str :
+            Solution.warn(self.list)
+            return False
+
+        for k in self.list.keys():
+            if k not in employees :
+                Solution.warn(f"{k} is not the index of an employee")
+                return False
+            for v in list(self.list[k].keys())[1:] :
+                if v not in tasks + unavails:
+                    Solution.warn(f"{v} is not the index of a task or an unvavailability")
+                    return False
+        return True
+
+    @Instrumentation.timed("validation", counter="feasibility_checks")
+    def validate(self):
+        """
+        validate the modifications
+        :return: whether the constraints are verified
+        """
+
+        # verify that x, y and l contain only 0 and 1
+        if not self.validate_format(): return False
+
+        # C1, okay thank to the format
+
+        # C2
+        visited = []
+        for k in self.list.keys():
+            for v in self.list[k].keys():
+                if v in visited :
+                    Solution.warn("C2: Each task should be done by at most one employee.")
+                    Solution.warn(f"Condition violated by node {v} done by employees {k}.", "cyan")
+                    return False
+                visited.append(v)
+
+        # C3.a and C3.b2
+        for v in unavails :
+            for k in self.list.keys() :
+                if Node.list[v].employee.index_of() == k and not v in self.list[k].keys():
+                    Solution.warn("C3.a: Unavailabilities should be visited.")
+                    Solution.warn(f"Condition violated by node {v}.", "cyan")
+                    return False
+
+        for k in self.list.keys():
+            if list(self.list[k].keys())[0] != k:
+                Solution.warn(f"C3.b: Each employee should visits their home.")
+                Solution.warn(f"Condition violated by employee {k}.", "cyan")
+                return False
+
+        # C4, okay thank to the format
+
+        # C5 + C6.b
+        for k in self.list.keys():
+            delta1 = 0
+            for v in self.list[k].keys():
+                if v == k :
+                    continue
+                if (v == list(self.list[k].keys())[-1] or v == list(self.list[k].keys())[1]) and v in unavails :
+                    opening, closing = Node.list[v].opening_time, Node.list[v].closing_time
+                    self.list[k][v][0] = opening
+                    self.list[k][v][1] = opening
+                    delta1 += opening - self.list[k][v][0]
+                    continue
+                self.list[k][v][0] += delta1
+
+                opening, closing = Node.list[v].opening_time, Node.list[v].closing_time
+                m = self.list[k][v][1] - opening
+                if m<0 :
+                    Solution.warn(f"C5: A task should be worked on between its opening time and closing time")
+                    Solution.warn(f"Condition violated by task {v}", "cyan")
+                    return False
+                if  opening > self.list[k][v][0] :
+                    delta1 += opening - self.list[k][v][0]
+                    self.list[k][v][0] = opening
+
+                m = closing - (self.list[k][v][0] + Node.list[v].duration)
+                if m<0 :
+                    Solution.warn(f"C5: A task should be worked on between its opening time and closing time")
+                    Solution.warn(f"Condition violated by task {v}", "cyan")
+                    return False
+                if  closing < self.list[k][v][1] + Node.list[v].duration:
+                    self.list[k][v][1] = closing - Node.list[v].duration
+
+                if v in unavails :
+                    self.list[k][v][0] = opening
+                    self.list[k][v][1] = opening
+
+            for i in range(len(self.list[k].keys())-1, 0, -1):
+                if i == 1:
+                    v1 = list(self.list[k].keys())[i]
+                    v2 = list(self.list[k].keys())[i-1]
+                    delta = temps(v1,v2)
+                    new_t2 = self.list[k][v1][1] - delta
+                    if new_t2 < self.list[k][v2][0] and v1 not in unavails:
+                        Solution.warn(f"C5: A task should be worked on between its opening time and closing time")
+                        Solution.warn(f"Condition violated by task {v2}", "cyan")
+                        return False
+                    else :
+                        self.list[k][v2][1] = min(self.list[k][v2][1],new_t2)
+                        if self.list[k][v2][1] < self.list[k][v2][0] :
+                            self.list[k][v2][0] = self.list[k][v2][1]
+                else :
+                    v1 = list(self.list[k].keys())[i]
+                    v2 = list(self.list[k].keys())[i-1]
+                    delta =  Node.list[v2].duration + temps(v1,v2)
+                    new_t2 = self.list[k][v1][1] - delta
+                    if new_t2 < self.list[k][v2][0] :
+                        Solution.warn(f"C5: A task should be worked on between its opening time and closing time")
+                        Solution.warn(f"Condition violated by task {v2}", "cyan")
+                        return False
+                    else :
+                        self.list[k][v2][1] = min(self.list[k][v2][1],new_t2)
+        # C6.a +
+        for k in self.list.keys():
+            if len(list(self.list[k].keys())) == 1: continue
+            v = list(self.list[k].keys())[1]
+            if v not in unavails :
+                if self.list[k][v][0] < Employee.list[k].start_time :
+                    Solution.warn(f"C6.a: Employees' start times should be respected")
+                    Solution.warn(f"Condition violated by employee {k}", "cyan")
+                    return False
+
+        # C7 C8 : Respected by nature
+
+        # C9
+        for k in self.list.keys():
+            if len(list(self.list[k].keys())) == 1 : continue
+            v = list(self.list[k].keys())[-1]
+            if self.list[k][v][1] + Node.list[v].duration + temps(v,k) > Employee.list[k].end_time :
+                Solution.warn("C9: An employee should have enough time to go back home.")
+                Solution.warn(f"Condition violated by employee {k} after task {v}", "cyan")
+                return False
+
+        # C10
+        for k in self.list.keys() :
+            Lunch_Break = False
+            for i in range(len(self.list[k].keys())):
+                v = list(self.list[k].keys())[i]
+                t1,t2 = self.list[k][v]
+                if i>=1 :
+                    v_pred = list(self.list[k].keys())[i-1]
+                    if t1 - temps(v,v_pred) <= 13*60 and t2>=13*60 and t2-t1>= 60 :
+                        '''on a espoire de pouvoir placer la pause déjeuner avant la tâche v'''
+                        if t1 - temps(v,v_pred) <= 12*60:
+                            t_end_lunch = 13*60
+                        else :
+                            t_end_lunch = t1 - temps(v,v_pred) + 60
+                        def rec(i,t):
+                            '''on vérifie que l'insertion du déjeuner ne dérange pas la suite de la journée'''
+                            if i==len(self.list[k].keys()):
+                                '''On est arrivé à la fin de la journée sans soucis'''
+                                return True
+                            else :
+                                v1 = list(self.list[k].keys())[i-1]
+                                v2 = list(self.list[k].keys())[i]
+                                t1,t2 = self.list[k][v2]
+                                if v1 == k:
+                                    d = temps(v1,v2)
+                                else :
+                                    d = Node.list[v1].duration + temps(v1,v2)
+                                T = t + d
+                                if T>t2:
+                                    '''Le décalage introduit par le lunch ne permet pas de réaliser les tâches'''
+                                    return False
+                                if T<=t1 :
+                                    '''Le décalage permet la réalisation de la tâche
+                                    et n'implique aucune modification dans la suite de la journée'''
+                                    return True
+                                else :
+                                    return rec(i+1,T)
+                        Lunch_Break = rec(i+1,t_end_lunch)
+                        if Lunch_Break :
+                            self.list[k][v][0] = t_end_lunch
+                            def rec2(i,t):
+                                '''On modifie les créneaux possible de ralisation des tâches
+                                suite à l'insertion du lunch'''
+                                if i==len(self.list[k].keys()):
+                                    return
+                                else :
+                                    v1 = list(self.list[k].keys())[i-1]
+                                    v2 = list(self.list[k].keys())[i]
+                                    t1,t2 = self.list[k][v2]
+                                    if v1 == k:
+                                        d = temps(v1,v2)
+                                    else :
+                                        d = Node.list[v1].duration + temps(v1,v2)
+                                    T = t + d
+                                    self.list[k][v2][0] = max(T,t1)
+                                    if T<=t1 :
+                                        return
+                                    else :
+                                        return rec2(i+1,T)
+                            n = rec2(i+1,t_end_lunch)
+                            self.lunch_times[k] = t_end_lunch - 60
+                            break
+                elif t1<= 13*60 and t2>=13*60 and t2-t1>=60 :
+                    '''on a espoire de pouvoir placer la pause déjeuner avant la tâche v'''
+                    if t1<=12*60:
+                        t_end_lunch = 13*60
+                    else :
+                        t_end_lunch = t1+60
+                    def rec(i,t):
+                        '''on vérifie que l'insertion du déjeuner ne dérange pas la suite de la journée'''
+                        if i==len(self.list[k].keys()):
+                            '''On est arrivé à la fin de la journée sans soucis'''
+                            return True
+                        else :
+                            v1 = list(self.list[k].keys())[i-1]
+                            v2 = list(self.list[k].keys())[i]
+                            t1,t2 = self.list[k][v2]
+                            if v1 == k:
+                                d = temps(v1,v2)
+                            else :
+                                d = Node.list[v1].duration + temps(v1,v2)
+                            T = t + d
+                            if T>t2:
+                                '''Le décalage introduit par le lunch ne permet pas de réaliser les tâches'''
+                                return False
+                            if T<=t1 :
+                                '''Le décalage permet la réalisation de la tâche
+                                et n'implique aucune modification dans la suite de la journée'''
+                                return True
+                            else :
+                                return rec(i+1,T)
+                    Lunch_Break = rec(i+1,t_end_lunch)
+                    if Lunch_Break :
+                        self.list[k][v][0] = t_end_lunch
+                        def rec2(i,t):
+                            '''On modifie les créneaux possible de ralisation des tâches
+                            suite à l'insertion du lunch'''
+                            if i==len(self.list[k].keys()):
+                                return
+                            else :
+                                v1 = list(self.list[k].keys())[i-1]
+                                v2 = list(self.list[k].keys())[i]
+                                t1,t2 = self.list[k][v2]
+                                if v1 == k:
+                                    d = temps(v1,v2)
+                                else :
+                                    d = Node.list[v1].duration + temps(v1,v2)
+                                T = t + d
+                                self.list[k][v2][0] = max(T,t1)
+                                if T<=t1 :
+                                    return
+                                else :
+                                    return rec2(i+1,T)
+                        n = rec2(i+1,t_end_lunch)
+                        self.lunch_times[k] = t_end_lunch - 60
+                        break
+
+            if not Lunch_Break and v>=len(self.list.keys()) and t1 + Node.list[v].duration <= 13*60 :
+                if Employee.list[k].end_time >= max(t1 + Node.list[v].duration,12*60) + 60 +temps(v,k) :
+                    self.lunch_times[k] = max(t1 + Node.list[v].duration,12*60)
+                    self.list[k][v][1] = min(self.lunch_times[k] - Node.list[v].duration,t2)
+                    Lunch_Break = True
+            elif not Lunch_Break and v <len(self.list.keys()):
+                self.lunch_times[k] = 12*60
+                self.list[k][v][1] = 12*60
+                Lunch_Break = True
+
+            if not Lunch_Break :
+                Solution.warn("C10: Each employee must have the time to lunch")
+                Solution.warn(f"Condition violated by employee {k}", "cyan")
+                return False
+
+        # C12
+        for k in self.list.keys():
+            for i in range(len(self.list[k].keys())-1):
+                v1 = list(self.list[k].keys())[i]
+                v2 = list(self.list[k].keys())[i+1]
+                if i == 0 and self.list[k][v1][0] + temps(v1,v2) > self.list[k][v2][1] :
+                    Solution.warn("C12: The traveling time between two nodes should be sufficient.")
+                    Solution.warn(f"Condition violated between node {v1} and {v2}", "cyan")
+                    return False
+
+        # C13
+        for k in self.list.keys():
+            for v in self.list[k].keys():
+                if v in tasks and Employee.list[k].level < Node.list[v].level :
+                    Solution.warn("C13: An employee can only do tasks that they are able to do.")
+                    Solution.warn(f"Condition violated by employee {k} at node {v}", "cyan")
+                    return False
+
+        # Every condition is verified
+        return True
+
+
+# Représentation des solutions : un dictionnaire employé -> route, les routes n'étant jamais modifiées sur place.
+# Une solution voisine partage donc avec la solution courante toutes les routes qui n'ont pas changé.
+
+def with_routes(routes, *new_routes):
+    '''Renvoie la solution "routes" où sont remplacées les routes des employés de "new_routes",
+    les autres routes étant partagées sans être copiées'''
+    sol = dict(routes)
+    for route in new_routes:
+        sol[route[0]] = route
+    return sol
+
+
+class SolutionHistory:
+    '''Historique d'une recherche tabou enregistré sous forme de différences : pour chaque itération,
+    les opérations appliquées et les seules routes modifiées. Une solution passée est reconstruite
+    en rejouant les différences depuis la solution initiale'''
+
+    def __init__(self):
+        self.initial = None
+        self.deltas = []  # (itération, opérations, {employé : nouvelle route})
+
+    def start(self, initial):
+        self.initial = initial
+        self.deltas = []
+
+    def record(self, it, operations, previous, current):
+        changed = {k : route for k, route in current.items() if previous.get(k) is not route}
+        self.deltas.append((it, operations, changed))
+
+    def solution_at(self, index):
+        '''Solution obtenue après les "index" premières itérations enregistrées'''
+        sol = dict(self.initial)
+        for _, _, changed in self.deltas[:index]:
+            sol.update(changed)
+        return sol
+
+    def __len__(self):
+        return len(self.deltas)
+
+
+# Définition des objets
+def evaluate(routes):
+    ''' Renvoie les valeurs des fonctions objectifs associé à l'instances représentée par "routes" '''
+    total_task_duration = 0
+    total_distance = 0
+    for route in list(routes.values()) :
+        for i in range(1,len(route)) :
+            if route[i] not in unavails :
+                total_task_duration += Node.list[route[i]].duration
+            total_distance += Node.distance[route[i-1],route[i]]
+        total_distance += Node.distance[route[-1],route[0]]
+    return (total_task_duration, total_distance)
+
+def compare(a,b):
+    '''Renvoie True si la solution b est meilleurs que la solution a,
+    en considérant la minimisation de la distance en priorité'''
+    if a[1] > b[1] :
+        return True
+    elif a[1] == b[1] and a[0] < b[0] :
+        return True
+    return False
+
+def compare2(a,b):
+    '''Renvoie True si la solution b est meilleurs que la solution a,
+    en considérant la maximisation de la durée des tâches en priorité'''
+    if a[0] < b[0] :
+        return True
+    elif a[0] == b[0] and a[1] > b[1] :
+        return True
+    return False
+
+def simple_sol(route):
+    '''Renvoie une solution simple dont les tâches de l'employé route[0] on été remplacées par route'''
+    sol = sol_init("")
+    sol[route[0]] = route
+    return sol
+
+def add_time(routes):
+    '''Permet de calculer pour chaque tâche le temps au quel la tâche peut-être commencée au plus tôt et au plus tard.
+    Le calcul ne prend en compte que les horaires de l'employé, la durée des tâches et les temps de parcours entre celles ci'''
+    routes_timed = {}
+    for k in range(len(routes)):
+        routes_timed[k] = {}
+        v0 = routes[k][0]
+        routes_timed[k][v0] = Employee.list[k].start_time
+        for i in range(1,len(routes[k])):
+            v1 = routes[k][i-1]
+            v2 = routes[k][i]
+            if i == 1 :
+                d = temps(v1,v2)
+            else :
+                if v1<len(Employee.list):
+                    return "Not Possible"
+                d = Node.list[v1].duration + temps(v1,v2)
+            routes_timed[k][v2] = routes_timed[k][v1] + d
+        
+        v = routes[k][-1]
+        if v<len(Employee.list):
+            margin = Employee.list[k].end_time - (routes_timed[k][v] + temps(v,v0))
+        else :
+            margin = Employee.list[k].end_time - (routes_timed[k][v] + Node.list[v].duration + temps(v,v0))
+        if margin <0 :
+            return "Not Possible"
+        else :
+            for i in range(len(routes[k])):
+                v = routes[k][i]
+                routes_timed[k][v] = [routes_timed[k][v],routes_timed[k][v]+margin]
+    return routes_timed
+
+
+# Définition de la list Tabou
+
+def update_tabu(Tabu_list, operations, iter, tabu_step):
+    '''Ajoute à la liste tabou les opérations et retire les opérations qui sont restées dans la liste le temps suffisant'''
+    nb_op = len(operations)
+    for i in range(nb_op):
+        Tabu_list[iter+i/nb_op] = operations[i]
+    for key in list(Tabu_list.keys()) :
+        if key < iter - tabu_step +1 :
+            del Tabu_list[key]
+
+def tabu_of(op):
+    '''Pour une opération retourne l'opération "contraire" qui doit être ajoutée à la liste tabou'''
+    if op.type == "Adding":
+        non_op = op.copy()
+        non_op.type = "Deleting"
+        return non_op
+    elif op.type == "Deleting":
+        non_op = op.copy()
+        non_op.type = "Adding"
+        return non_op
+    else:
+        return op
+
+def op_in(op,dict_op):
+    '''Renvoie True si l'opération "op" est dans les valeurs du dictionnaire "dict_op"'''
+    for op2 in list(dict_op.values()):
+        if op.type == op2.type and op.node == op2.node and op.employee1 == op2.employee1 and op.employee2 == op2.employee2 :
+            Instrumentation.count("tabu_rejections")
+            return True
+    return False
+
+
+# Définition du voisinage
+
+def Crossing(route1, route2, max_len_cross):
+    '''Renvoie les voisins issues du mélange des deux routes.
+    Avec le graphe de voisinage (cf. neighbor_graph.py), seuls les segments que l'autre employé peut effectuer et
+    dont une extrémité est reliée à la route d'arrivée par un successeur prometteur sont échangés'''
+    graph = NeighborGraph.get()
+    Neighbors = []
+    n1 = len(route1)
+    n2 = len(route2)
+    for l1 in range(max_len_cross+1):
+        for l2 in range(max_len_cross+1): 
+            if l1 == 0 and l2 ==0:
+                continue
+            for i in range(1,n1-l1):
+                for j in range(1,n2-l2):
+                    if graph is not None and not (
+                            graph.allows_insertion(route1[0], route1[i-1], route2[j:j+l2], route1[i+l1])
+                            and graph.allows_insertion(route2[0], route2[j-1], route1[i:i+l1], route2[j+l2])):
+                        continue
+                    new_route1 = route1[:i]+route2[j:j+l2]+route1[i+l1:]
+                    new_route2 = route2[:j]+route1[i:i+l1]+route2[j+l2:]
+                    Neighbors.append((new_route1,new_route2))
+    return Neighbors
+
+def Switching(route):
+    '''Renvoie toutes les permutation des tâches de la trajectoire "route"'''
+    Neighbors = []
+    permutations = list(itertools.permutations(route[1:]))
+    for p in permutations :
+        Neighbors.append([route[0]]+[x for x in p])
+    return Neighbors
+
+def Adding_Node(route,unvisited_nodes):
+    '''Renvoie toutes les routes, venant de l'ajout d'une tâche alors non visitée dans la route originelle.
+    Avec le graphe de voisinage, une tâche n'est insérée que si l'employé en a le niveau, et juste après un sommet
+    dont elle est un successeur prometteur ou juste avant l'un de ses successeurs prometteurs'''
+    graph = NeighborGraph.get()
+    Neighbors = []
+    if graph is None:
+        for node in unvisited_nodes :
+            for i in range(len(route)):
+                    Neighbors.append((route[:i+1]+[node]+route[i+1:],node))
+        return Neighbors
+    k = route[0]
+    for i in range(len(route)):
+        prev = route[i]
+        nxt = route[i+1] if i+1 < len(route) else k
+        # successeurs prometteurs de prev, puis tâches dont nxt est un successeur prometteur
+        candidates = [v for v in graph.successors[prev] if v in unvisited_nodes and graph.eligible(k, v)]
+        if nxt != k:
+            candidates += [v for v in graph.predecessors[nxt] if v in unvisited_nodes and graph.eligible(k, v)
+                           and not graph.is_promising(prev, v)]
+        for node in candidates:
+            Neighbors.append((route[:i+1]+[node]+route[i+1:],node))
+    return Neighbors
+
+def Deleting_Node(route):
+    '''Renvoie toutes les routes, venant de la suppression d'une tâche dans la route originelle'''
+    Neighbors = []
+    for i in range(1,len(route)):
+        if route[i] not in unavails:
+            Neighbors.append((route[:i]+route[i+1:], route[i]))
+    return Neighbors
+
+def local_neighbor_switching(route,Tabu_list):
+    '''Renvoie la route faisable, issue d'une permutation de "route", 
+    ayant les meilleurs valeurs des fonction objectifs'''
+    candidate_list = Switching(route)
+    Instrumentation.count("candidates", len(candidate_list))
+    local_obj_values = (0,10**10)
+    local_sol = route
+    local_op = None
+    graph = NeighborGraph.get()
+    for candidate in candidate_list:
+        op = Operation(type = "Switching", employee1=route[0])
+        if graph is not None and not graph.can_sequence(candidate):
+            continue
+        if not op_in(op, Tabu_list) and RouteCache.feasible(candidate) :
+            obj_values = RouteCache.objectives(candidate)
+            if compare(local_obj_values, obj_values) :
+                local_sol = candidate
+                local_obj_values = obj_values
+                local_op = op
+
+    return local_sol, local_op
+
+def local_neighbor_adding(route,unvisited_nodes,Tabu_list):
+    '''Renvoie la route faisable, issue d'un ajout de tâche dans "route", 
+    ayant les meilleurs valeurs des fonction objectifs'''
+    candidate_list = Adding_Node(route,unvisited_nodes)
+    Instrumentation.count("candidates", len(candidate_list))
+    local_obj_values = (0,10**10)
+    add_node = -1
+    local_op = None
+    for candidate, node in candidate_list:
+        op = Operation(type = "Adding", node = node, employee1 = route[0])
+        if not op_in(op,Tabu_list) and RouteCache.feasible(candidate) :
+            obj_values = RouteCache.objectives(candidate)
+            if compare(local_obj_values, obj_values) :
+                local_sol = candidate
+                local_obj_values = obj_values
+                add_node = node
+                local_op = op
+
+    if add_node == -1:
+        return route, None
+
+    del unvisited_nodes[add_node]
+
+    return local_sol, local_op
+
+def create_neighborhood(routes, unvisited_nodes, status, max_len_cross, Tabu_list):
+    '''Renvoie les meilleurs voisins de la solution routes, selon le status de voisinage désiré.
+    Adding : on ajoute des tâches;
+    Switching : On permute les tâches aux seins des trajectoires des employés;
+    Deleting : On retire une tâche.'''
+    phase = "neighborhood_" + (status if status in ["adding", "deleting"] else "exchange")
+    with Instrumentation.timer(phase):
+        return _create_neighborhood(routes, unvisited_nodes, status, max_len_cross, Tabu_list)
+
+def _create_neighborhood(routes, unvisited_nodes, status, max_len_cross, Tabu_list):
+    T = len(routes)
+
+    if status == "adding":
+        operations = []
+        new_routes = {}
+        for i in range(T):
+            Neighbor,op = local_neighbor_adding(routes[i],unvisited_nodes,Tabu_list)
+            if Neighbor != routes[i]:
+                operations.append(op)
+            new_routes[Neighbor[0]] = Neighbor
+        Neighborhood = [(new_routes,operations)]
+
+    elif status == "deleting":
+        local_obj_values = (0,10**10)
+        del_node = -1
+        local_op = None
+        local_candidate = None
+        for i in range(T):
+            Neighbors = Deleting_Node(routes[i])
+            Instrumentation.count("candidates", len(Neighbors))
+            for candidate, node in Neighbors:
+                obj_values = RouteCache.objectives(candidate)
+                op = Operation(type = "Deleting", node = node, employee1 = candidate[0])
+                if compare(local_obj_values, obj_values) :
+                    local_candidate = candidate
+                    local_obj_values = obj_values
+                    del_node = node
+                    local_op = op
+        
+        if del_node == -1:
+            Neighborhood = [(routes, [local_op])]
+
+        else :
+            unvisited_nodes[del_node] = None
+            # seule la solution voisine du meilleur candidat est construite
+            Neighborhood = [(with_routes(routes, local_candidate), [local_op])]
+
+    else :
+        Neighborhood = []
+        local_obj_values = (0,10**10)
+        local_op = None
+        graph = NeighborGraph.get()
+        for i in range(T):
+            for j in range(i+1,T):
+                if graph is not None and not graph.are_adjacent(routes[i], routes[j]):
+                    continue
+                Neighbors = Crossing(routes[i], routes[j], max_len_cross)
+                Instrumentation.count("candidates", len(Neighbors))
+                for (route1,route2) in Neighbors:
+                    op = Operation(type = "Exchange", employee1 = route1[0], employee2 = route2[0])
+                    if not op_in(op, Tabu_list) and RouteCache.feasible(route1) and RouteCache.feasible(route2) :
+                        obj_values = evaluate({route1[0] : route1 , route2[0] : route2})
+                        if compare(local_obj_values, obj_values) :
+                            local_sol = route1,route2
+                            local_obj_values = obj_values
+                            local_op = op
+        if local_obj_values == (0,10**10):
+            return [(routes, [local_op])]
+        Neighborhood = [(with_routes(routes, *local_sol), [local_op])]
+
+    return Neighborhood
+
+def intensify(routes, max_stops):
+    '''Renvoie les routes dont les sommets ont été réordonnés de façon optimale (cf. resequencing.py),
+    lorsque le nouvel ordre est plus court et reste valide pour la recherche tabou'''
+    # importé ici, resequencing important ce module par l'intermédiaire de replanning
+    from resequencing import resequence
+
+    new_routes = dict(routes)
+    for k, route in routes.items():
+        sequence = resequence(route, max_stops)
+        if sequence is not None and sequence.route != route and RouteCache.feasible(sequence.route) \
+                and RouteCache.objectives(sequence.route)[1] < RouteCache.objectives(route)[1]:
+            new_routes[k] = sequence.route
+            Instrumentation.count("resequenced_routes")
+    return new_routes
+
+# Initialisation / 1ère solution
+def sol_init(type):
+    '''Renvoie une solution initiale calculée rapidement'''
+    if isinstance(type, dict):
+        return {k : list(route) for k, route in type.items()}
+    if type == "glouton1":
+        sol = GreedySolution()
+        sol.optimize_employee_by_employee()
+        sol_nodes = sol.employee_node_lists
+        for route in list(sol_nodes.values()):
+            sol_nodes[route[-1]] = [route[-1]] + route[:len(route)-1]
+        return sol_nodes
+    elif type == "glouton2":
+        sol = GreedySolution()
+        sol.optimize_simultaneous()
+        sol_nodes = sol.employee_node_lists
+        for route in list(sol_nodes.values()):
+            sol_nodes[route[-1]] = [route[-1]] + route[:len(route)-1]
+        return sol_nodes
+    elif type == "clustering":
+        sol = None
+    else :
+        sol = {}
+        for i in range(len(Employee.list)):
+            sol[i] = [i]
+        for v in unavails :
+            employee = Node.list[v].employee
+            employee_idx = Employee.index_of(employee)
+            sol[employee_idx].append(v)
+        return sol
+
+def search_unvisited_nodes(sol):
+    '''Revoie un dictionnaire dont les clés sont les tâches non efféctuées par la solution "sol"'''
+    unvisited_nodes = {}
+    for i in range(len(Node.list)):
+        unvisited_nodes[i] = None
+    for route in list(sol.values()):
+        for node in route :
+            del unvisited_nodes[node]
+    return unvisited_nodes
+
+
+# Itérations
+
+def tabu_search(init_sol = " ",max_it = 30, tabu_step = 10, max_len_cross = 10, block_max = 3, plot = True, verbose = True,
+                time_limit = None, stop = None, gap_tolerance = None, resequence_max_stops = 10, history = None):
+    '''Exécution de l'algorithme tabou.
+    "init_sol" est soit le type de solution initiale (cf. sol_init), soit directement des routes à améliorer.
+    "time_limit" est la durée maximale de la recherche en secondes, et "stop" une fonction sans argument
+    renvoyant True pour interrompre la recherche ; la meilleure solution trouvée est alors renvoyée.
+    "gap_tolerance" arrête la recherche dès que l'écart relatif entre la meilleure solution et la borne supérieure
+    des minutes de tâches (cf. bounds.compute_bounds) est inférieur ou égal à cette valeur.
+    Les routes de chaque meilleure solution ayant au plus "resequence_max_stops" sommets sont réordonnées de façon
+    optimale (cf. intensify), 0 pour ne pas les réordonner.
+    "history" est un SolutionHistory recevant les différences entre solutions successives ; seule la solution
+    courante est conservée sinon'''
+    deadline = time.perf_counter() + time_limit if time_limit is not None else None
+    upper_bounds = compute_bounds() if gap_tolerance is not None else None
+    # the greedy constructions time themselves as the "construction" phase
+    sol = sol_init(init_sol)
+    current = sol
+    if history is not None:
+        history.start(sol)
+    best_obj_values = evaluate(sol)
+    Tabu_list = {0 : Operation(type = "None")}
+    block_count = 0
+    unvisited_nodes = search_unvisited_nodes(sol)
+    climbing = True
+    list_locals_temps = []
+    list_locals_dist = []
+    list_globals_temps = []
+    list_globals_dist = []
+    for it in range(1,max_it):
+        if (deadline is not None and time.perf_counter() >= deadline) or (stop is not None and stop()):
+            break
+        if upper_bounds is not None and upper_bounds.gap(best_obj_values[0]) <= gap_tolerance:
+            Instrumentation.count("gap_stops")
+            break
+        block_count += 1
+
+        if block_count >= block_max :
+            neighborhood = create_neighborhood(current, unvisited_nodes, "deleting", max_len_cross, Tabu_list)
+            block_count = 0
+            climbing = True
+        elif climbing :
+            neighborhood = create_neighborhood(current, unvisited_nodes, "adding", max_len_cross,Tabu_list)
+            if [neighborhood[0][1][i] for i in range(len(neighborhood[0][1]))] == [None]*len(neighborhood[0][1]) :
+                climbing = False
+            else :
+                block_count = 0
+
+        if not climbing :
+            neighborhood = create_neighborhood(current, unvisited_nodes, " ", max_len_cross, Tabu_list)
+            if [neighborhood[0][1][i] for i in range(len(neighborhood[0][1]))] == [None]*len(neighborhood[0][1]) :
+                neighborhood = create_neighborhood(current, unvisited_nodes, "deleting", max_len_cross, Tabu_list)
+                block_count = 0
+
+        local_sol, local_operations = neighborhood[0]
+        local_obj_values = evaluate(local_sol)
+
+        update_tabu(Tabu_list, local_operations, it, tabu_step)
+        if history is not None:
+            history.record(it, local_operations, current, local_sol)
+        current = local_sol
+
+        if compare2(best_obj_values, local_obj_values):
+            sol = local_sol
+            best_obj_values = local_obj_values
+            if resequence_max_stops:
+                # la meilleure solution est réordonnée, la recherche continue depuis local_sol
+                with Instrumentation.timer("resequencing"):
+                    sol = intensify(sol, resequence_max_stops)
+                best_obj_values = evaluate(sol)
+            block_count = 0
+            Instrumentation.count("improving_moves")
+
+        Instrumentation.event("tabu_iteration", it=it, task_minutes=local_obj_values[0], distance=local_obj_values[1],
+                              best_task_minutes=best_obj_values[0], best_distance=best_obj_values[1])
+        if verbose:
+            print(it, local_obj_values)
+        list_locals_temps.append(local_obj_values[0])
+        list_locals_dist.append(local_obj_values[1])
+        list_globals_temps.append(best_obj_values[0])
+        list_globals_dist.append(best_obj_values[1])
+    if not plot:
+        return sol, best_obj_values
+    import matplotlib.pyplot as plt  # optional dependency, only needed for plotting
+    X = [i for i in range(len(list_locals_temps))]
+    fig, axs = plt.subplots(4)
+    fig.suptitle('Algorithme exploration')
+    axs[0].plot(X[10:], list_locals_temps[10:])
+    axs[0].plot(X[10:], list_globals_temps[10:])
+    axs[1].plot(X[10:],list_locals_dist[10:])
+    axs[1].plot(X[10:],list_globals_dist[10:])
+    axs[2].plot(X, list_locals_temps)
+    axs[2].plot(X, list_globals_temps)
+    axs[3].plot(X,list_locals_dist)
+    axs[3].plot(X,list_globals_dist)
+    plt.show()
+    return sol, best_obj_values
@@ -0,0 +1,152 @@
+"""
+Granular neighbourhoods: a graph of the tasks each employee may perform (by level) and of the tasks which may follow
+each node (by time windows and travel time), with the k most promising successors of every node.
+The moves of the greedy algorithm and of the tabu search are generated along this graph only, so that a node is
+inserted next to a few promising nodes instead of at every position of every route.
+
+The graph is opt-in: by default the moves are generated exhaustively. NeighborGraph.set_k(32) enables it, which
+makes the tabu search about ten times faster on the larger instances but changes the results, e.g. the greedy
+algorithm employee by employee performs 8535 task minutes on Romania V3 with the graph against 8045 without, and
+dense and sparse distances no longer give the same solutions since their nearest tasks differ.
+The graph of the currently loaded instance is built on first use by NeighborGraph.get() and dropped when another
+instance is loaded.
+"""
+# module importation
+import numpy as np
+
+# model classes for employees and nodes
+from models_v2 import Employee, Node, Task, Home, Unavail
+
+INFINITY = 10 ** 9
+
+
+class NeighborGraph:
+    """
+    Eligibility and sequencing graph of the currently loaded instance
+    :param k: number of successors kept per node
+    """
+    k = None  # number of successors kept per node, None to disable the graph
+    _current = None
+
+    def __init__(self, k):
+        self.k = k
+        n_employees, n_tasks = Employee.count, Task.count
+        self.tasks = np.arange(n_employees, n_employees + n_tasks)
+        self.employee_level = np.array([employee.level for employee in Employee.list])
+        # level required at each node: the level of a task, the level of its employee at a home or unavailability
+        self.level = np.zeros(Node.count, dtype=np.int64)
+        # earliest end and latest start of the visit of each node, the unperformable tasks ending at INFINITY
+        self.earliest_start = np.zeros(Node.count, dtype=np.int64)
+        self.earliest_end = np.zeros(Node.count, dtype=np.int64)
+        self.latest_start = np.zeros(Node.count, dtype=np.int64)
+        for i, node in enumerate(Node.list):
+            if isinstance(node, Task):
+                intervals = node.open_intervals()
+                self.level[i] = node.level
+                self.earliest_start[i] = intervals[0][0] if intervals else INFINITY
+                self.earliest_end[i] = intervals[0][0] + node.duration if intervals else INFINITY
+                self.latest_start[i] = intervals[-1][1] - node.duration if intervals else -INFINITY
+            elif isinstance(node, Home):
+                employee = node.employee
+                self.level[i] = employee.level
+                self.earliest_start[i] = self.earliest_end[i] = employee.start_time
+                self.latest_start[i] = employee.end_time
+            else:
+                node: Unavail
+                self.level[i] = node.employee.level
+                self.earliest_start[i] = node.opening_time
+                self.earliest_end[i] = node.closing_time
+                self.latest_start[i] = node.opening_time
+        # successors[i]: the k most promising tasks to perform right after node i, best first
+        self.successors = [self._successors(i) for i in range(Node.count)]
+        self.successor_sets = [set(successors) for successors in self.successors]
+        # predecessors[j]: the nodes having j among their successors
+        self.predecessors = [[] for _ in range(Node.count)]
+        for i, successors in enumerate(self.successors):
+            for j in successors:
+                self.predecessors[j].append(i)
+
+    @classmethod
+    def get(cls):
+        """Graph of the currently loaded instance, built on first use, None if disabled"""
+        if cls.k is None:
+            return None
+        if cls._current is None or cls._current.k != cls.k:
+            cls._current = NeighborGraph(cls.k)
+        return cls._current
+
+    @classmethod
+    def set_k(cls, k):
+        """Number of successors kept per node, None to generate the moves exhaustively"""
+        cls.k = k
+
+    @classmethod
+    def clear(cls):
+        cls._current = None
+
+    def travel_time(self, i, j):
+        return int(np.ceil(Node.distance[i, j] / Employee.speed))
+
+    def eligible(self, employee_idx, node_idx):
+        """Whether the level of an employee allows them to visit a node"""
+        return self.level[node_idx] <= self.employee_level[employee_idx]
+
+    def eligible_tasks(self, employee_idx):
+        return self.tasks[self.level[self.tasks] <= self.employee_level[employee_idx]]
+
+    def can_follow(self, i, j):
+        """Whether node j can be visited right after node i for some timing of the two visits"""
+        return self.earliest_end[i] + self.travel_time(i, j) <= self.latest_start[j]
+
+    def is_promising(self, i, j):
+        return j in self.successor_sets[i]
+
+    def allows_insertion(self, employee_idx, prev, segment, nxt):
+        """
+        Whether inserting a sequence of nodes between prev and nxt in the route of an employee is a move of the
+        graph: every node is eligible for the employee and the segment starts among the successors of prev or nxt is
+        among the successors of the end of the segment
+        """
+        if not segment:
+            return True
+        if any(self.level[v] > self.employee_level[employee_idx] for v in segment):
+            return False
+        return segment[0] in self.successor_sets[prev] or nxt in self.successor_sets[segment[-1]]
+
+    def can_sequence(self, route):
+        """Whether each node of a route (in the format of the tabu search, starting at home) can follow the previous"""
+        return all(self.can_follow(route[p], route[p + 1]) for p in range(len(route) - 1))
+
+    def are_adjacent(self, route1, route2):
+        """Whether a successor of a node of one route is in the other, i.e. whether exchanging nodes may pay off"""
+        nodes1, nodes2 = set(route1), set(route2)
+        return any(not self.successor_sets[v].isdisjoint(nodes2) for v in route1) \
+            or any(not self.successor_sets[v].isdisjoint(nodes1) for v in route2)
+
+    def _candidates(self, i):
+        """Tasks near node i and their distances: all of them with a dense matrix, the stored neighbours otherwise"""
+        if isinstance(Node.distance, np.ndarray):
+            return self.tasks, Node.distance[i, self.tasks]
+        neighbors, distance = Node.distance.nearest(i)
+        is_task = (neighbors >= self.tasks[0]) & (neighbors < self.tasks[0] + len(self.tasks)) if len(self.tasks) \
+            else np.zeros(len(neighbors), dtype=bool)
+        return neighbors[is_task].astype(np.int64), distance[is_task]
+
+    def _successors(self, i):
+        """
+        The k tasks which can follow node i, by increasing travel plus waiting time: the earliest a task can start
+        after node i, the better
+        """
+        candidates, distance = self._candidates(i)
+        travel = np.ceil(distance / Employee.speed)
+        arrival = self.earliest_end[i] + travel
+        # a task and the node before it are performed by an employee of at least both levels
+        feasible = (arrival <= self.latest_start[candidates]) & (candidates != i)
+        if isinstance(Node.list[i], Task):
+            feasible &= np.maximum(self.level[candidates], self.level[i]) <= self.employee_level.max(initial=0)
+        else:
+            feasible &= self.level[candidates] <= self.level[i]
+        candidates, arrival = candidates[feasible], arrival[feasible]
+        cost = np.maximum(arrival, self.earliest_start[candidates]) - self.earliest_end[i]
+        order = np.argsort(cost, kind="stable")[:self.k]
+        return candidates[order].tolist()
@@ -0,0 +1,235 @@
+"""
+Trade-off curve between the two objectives, performed task minutes and travelled km, by an epsilon-constraint sweep:
+for each distance budget epsilon, the task minutes are maximized subject to the total distance being at most epsilon.
+
+The budgets are split into contiguous chains solved in parallel; along a chain, each point is warm-started from the
+solution of its neighbour with the next larger budget, which is trimmed to the new budget and then completed.
+The points are merged into the front as they arrive, dominated solutions being dropped.
+
+The front is a heuristic approximation, not the exact Pareto front: every point comes from trimming and completing
+the anchor solution, so the largest budget is the distance of the anchor and its point is the anchor itself, and
+no point is proven optimal for its budget. A better anchor, e.g. routes of the tabu search, gives a better front.
+
+Usage:
+    python pareto.py ./data/InstancesV3/InstanceUkraineV3.xlsx --points 12 --output results/pareto
+"""
+# module importation
+import argparse
+import bisect
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+# model classes for employees and nodes
+from models_v2 import Employee, Node
+import models_v3_tabu
+from models_v3_tabu import RouteCache, evaluate, sol_init
+from shared_instance import SharedInstance, attach
+
+
+class ParetoPoint:
+    def __init__(self, epsilon, task_minutes, distance_km, routes):
+        self.epsilon = epsilon  # distance budget in km
+        self.task_minutes = task_minutes
+        self.distance_km = distance_km
+        self.routes = routes  # in the format of the tabu search, routes[k] = [k, v1, ..., vn]
+
+    def dominates(self, other):
+        return (self.task_minutes >= other.task_minutes and self.distance_km <= other.distance_km
+                and (self.task_minutes > other.task_minutes or self.distance_km < other.distance_km))
+
+    def __repr__(self):
+        return f"ParetoPoint(epsilon={self.epsilon:.1f}, task_minutes={self.task_minutes}, " \
+               f"distance_km={self.distance_km:.1f})"
+
+
+class ParetoFront:
+    """Non-dominated points, sorted by increasing distance, hence by increasing task minutes"""
+
+    def __init__(self):
+        self.points = []
+
+    def add(self, point):
+        """
+        Insert a point unless it is dominated, removing the points it dominates
+        :return: whether the point was inserted
+        """
+        position = bisect.bisect_left([p.distance_km for p in self.points], point.distance_km)
+        # the points with a smaller distance have fewer minutes, the first one with a larger or equal distance
+        # is the only candidate to dominate it among the following ones
+        if position > 0 and self.points[position - 1].task_minutes >= point.task_minutes:
+            return False
+        if position < len(self.points) and self.points[position].distance_km == point.distance_km \
+                and self.points[position].task_minutes >= point.task_minutes:
+            return False
+        end = position
+        while end < len(self.points) and self.points[end].task_minutes <= point.task_minutes:
+            end += 1
+        self.points[position:end] = [point]
+        return True
+
+    def __iter__(self):
+        return iter(self.points)
+
+    def __len__(self):
+        return len(self.points)
+
+
+def _neighbours(route, position):
+    """Nodes before and after route[position], the route being a cycle through the employee's home"""
+    return route[position - 1], route[position + 1] if position + 1 < len(route) else route[0]
+
+
+def trim(routes, max_distance):
+    """
+    Remove tasks until the total distance is within the budget, those saving the most distance per task minute first
+    :param max_distance: budget in meter
+    :return: the new routes, which may still exceed the budget if no removal keeps them feasible
+    """
+    routes = {k: list(route) for k, route in routes.items()}
+    unavails = set(models_v3_tabu.unavails)
+    total = evaluate(routes)[1]
+    while total > max_distance:
+        candidates = []
+        for k, route in routes.items():
+            for p in range(1, len(route)):
+                v = route[p]
+                if v in unavails:
+                    continue
+                prev, nxt = _neighbours(route, p)
+                saving = Node.distance[prev, v] + Node.distance[v, nxt] - Node.distance[prev, nxt]
+                candidates.append((-saving / Node.list[v].duration, k, p, saving))
+        candidates.sort()
+        for _, k, p, saving in candidates:
+            route = routes[k][:p] + routes[k][p + 1:]
+            if RouteCache.feasible(route):
+                routes[k] = route
+                total -= saving
+                break
+        else:
+            break
+    return routes
+
+
+def complete(routes, max_distance):
+    """
+    Insert unvisited tasks while the total distance stays within the budget, choosing each time the feasible
+    insertion adding the least distance per task minute
+    :param max_distance: budget in meter
+    """
+    routes = {k: list(route) for k, route in routes.items()}
+    total = evaluate(routes)[1]
+    visited = {v for route in routes.values() for v in route}
+    unvisited = [v for v in models_v3_tabu.tasks if v not in visited]
+    while unvisited:
+        candidates = []
+        for v in unvisited:
+            task = Node.list[v]
+            for k, route in routes.items():
+                if Employee.list[k].level < task.level:
+                    continue
+                for p in range(len(route)):
+                    prev = route[p]
+                    nxt = route[p + 1] if p + 1 < len(route) else route[0]
+                    cost = Node.distance[prev, v] + Node.distance[v, nxt] - Node.distance[prev, nxt]
+                    if total + cost <= max_distance:
+                        candidates.append((cost / task.duration, -task.duration, k, p, v, cost))
+        candidates.sort()
+        for _, _, k, p, v, cost in candidates:
+            route = routes[k][:p + 1] + [v] + routes[k][p + 1:]
+            if RouteCache.feasible(route):
+                routes[k] = route
+                total += cost
+                unvisited.remove(v)
+                break
+        else:
+            break
+    return routes
+
+
+def solve_point(epsilon, warm_routes):
+    """Maximize the task minutes within a distance budget of epsilon km, starting from warm_routes"""
+    routes = trim(warm_routes, epsilon * 1000)
+    if evaluate(routes)[1] > epsilon * 1000:
+        # removing a task may break the lunch break of a route, start again from the routes without tasks
+        routes = sol_init("")
+    routes = complete(routes, epsilon * 1000)
+    task_minutes, distance = evaluate(routes)
+    return ParetoPoint(epsilon, task_minutes, distance / 1000, routes)
+
+
+def solve_chain(epsilons, warm_routes):
+    """Solve the budgets in decreasing order, each point being warm-started from the previous one"""
+    points = []
+    for epsilon in sorted(epsilons, reverse=True):
+        point = solve_point(epsilon, warm_routes)
+        points.append(point)
+        warm_routes = point.routes
+    return points
+
+
+def _init_worker(handle):
+    attach(handle)
+    models_v3_tabu.Solution.set_warning(False)
+
+
+def sweep(instance_path, n_points=12, workers=None, anchor="glouton2", on_point=None):
+    """
+    Compute a heuristic approximation of the trade-off curve of an instance
+    :param n_points: number of distance budgets, evenly spread between the distance of the solution without tasks
+    and the distance of the anchor solution
+    :param workers: number of processes, defaults to the number of CPUs
+    :param anchor: initial solution of every chain (cf. sol_init, e.g. routes of the tabu search), also giving the
+    largest budget and the point with the most task minutes
+    :param on_point: function called with each point as it is solved, and whether it entered the front
+    :return: the ParetoFront
+    """
+    models_v3_tabu.load_data_from_path(instance_path)
+    models_v3_tabu.Solution.set_warning(False)
+    anchor_routes = sol_init(anchor)
+    # budgets in km, the first one is the distance of the unavoidable visits of the unavailabilities
+    low, high = evaluate(sol_init(""))[1] / 1000, evaluate(anchor_routes)[1] / 1000
+    epsilons = list(np.linspace(high, low, n_points))
+    workers = min(workers or os.cpu_count() or 1, n_points)
+    chains = [list(chain) for chain in np.array_split(epsilons, workers) if len(chain)]
+
+    front = ParetoFront()
+    # the workers attach to the instance loaded here instead of reading the instance file again
+    with SharedInstance() as shared, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shared.handle,)) as executor:
+        futures = [executor.submit(solve_chain, chain, anchor_routes) for chain in chains]
+        for future in as_completed(futures):
+            for point in future.result():
+                inserted = front.add(point)
+                if on_point:
+                    on_point(point, inserted)
+    return front
+
+
+def main(argv=None):
+    from replanning import Schedule
+
+    parser = argparse.ArgumentParser(description="Compute the task minutes / km trade-off curve of an instance")
+    parser.add_argument("instance", help="path of the instance file")
+    parser.add_argument("--points", type=int, default=12, help="number of distance budgets")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--anchor", default="glouton2", choices=["glouton1", "glouton2"],
+                        help="greedy solution warm-starting the chains")
+    parser.add_argument("--output", help="directory receiving one result file per point of the front")
+    args = parser.parse_args(argv)
+
+    front = sweep(args.instance, args.points, args.workers, args.anchor)
+    print(f"{'epsilon (km)':>14}{'minutes':>10}{'km':>10}")
+    for point in front:
+        print(f"{point.epsilon:>14.1f}{point.task_minutes:>10}{point.distance_km:>10.1f}")
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+        name = os.path.splitext(os.path.basename(args.instance))[0]
+        for point in front:
+            Schedule.from_routes(point.routes).write_result(
+                os.path.join(args.output, f"{name}_{point.task_minutes}min_{point.distance_km:.0f}km.txt"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,477 @@
+# module importation
+from math import ceil
+
+# utilities
+from utils import parse_time_minute, read_result, write_result
+
+# model classes for employees and nodes
+from models_v2 import Employee, Node, Task, Home, Unavail
+import models_v3_greedy
+import models_v3_tabu
+
+LUNCH_EARLIEST = parse_time_minute("12:00PM")  # the lunch break starts between 12 and 13 o'clock
+LUNCH_LATEST = parse_time_minute("1:00PM")
+LUNCH_DURATION = 60
+
+
+def travel_time(i, j):
+    """Return the time, in minute, it takes to go from node i to node j"""
+    return ceil(Node.distance[i, j] / Employee.speed)
+
+
+def earliest_begin(node_idx, arrival_time):
+    """
+    Return the earliest time at which the node can begin if the employee arrives at arrival_time
+    :param node_idx: index of a task or an unavailability
+    :param arrival_time: the time at which the employee arrives at the node
+    :return: the begin time, or None if the node cannot be visited anymore
+    """
+    node = Node.list[node_idx]
+    if node.node_type == "unavail":
+        return node.opening_time if arrival_time <= node.opening_time else None
+    for start, end in node.open_intervals():
+        begin = max(arrival_time, start)
+        if begin + node.duration <= end:
+            return begin
+    return None
+
+
+def _forward(route, position, ready_time):
+    """
+    Visit the nodes of the route after the given position as early as possible
+    :return: the begin time of each visited node followed by the arrival time at home, or None if infeasible
+    """
+    employee = Employee.list[route[0]]
+    times = []
+    time, prev = ready_time, route[position]
+    for v in route[position + 1:]:
+        node = Node.list[v]
+        if node.node_type == "task" and node.level > employee.level:
+            return None
+        begin = earliest_begin(v, time + travel_time(prev, v))
+        if begin is None:
+            return None
+        times.append(begin)
+        time, prev = begin + node.duration, v
+    arrival_time = time + travel_time(prev, route[0])
+    if arrival_time > employee.end_time:
+        return None
+    times.append(arrival_time)
+    return times
+
+
+def time_route(route, start=0, ready_time=None, lunch_time=None):
+    """
+    Earliest-start timing of a route given in the format of the tabu search, i.e. [home, v1, ..., vn].
+    The lunch break is placed after the first node for which the rest of the day remains feasible.
+    :param route: the indices of the nodes visited by the employee, beginning with his home
+    :param start: position in the route of the last node already done, the nodes before it are not timed again
+    :param ready_time: the time at which the employee is free to leave route[start], defaults to his start time
+    :param lunch_time: start of the lunch break if it is already fixed, None if it has to be placed
+    :return: (begin_times, lunch_time) where begin_times holds the begin time of route[start + 1:]
+             followed by the arrival time at home, or None if the route is infeasible
+    """
+    if ready_time is None:
+        ready_time = Employee.list[route[0]].start_time
+    if lunch_time is not None:
+        times = _forward(route, start, ready_time)
+        return None if times is None else (times, lunch_time)
+
+    # finish time of each node of the route when no lunch break is taken
+    employee = Employee.list[route[0]]
+    finish_times = [ready_time]
+    for p in range(start + 1, len(route)):
+        prev, v = route[p - 1], route[p]
+        if Node.list[v].node_type == "task" and Node.list[v].level > employee.level:
+            return None
+        begin = earliest_begin(v, finish_times[-1] + travel_time(prev, v))
+        if begin is None:
+            break
+        finish_times.append(begin + Node.list[v].duration)
+
+    for p in range(start, start + len(finish_times)):
+        lunch = max(finish_times[p - start], LUNCH_EARLIEST)
+        if lunch > LUNCH_LATEST:
+            break
+        times = _forward(route, p, lunch + LUNCH_DURATION)
+        if times is not None:
+            prefix = [finish_times[q - start] - Node.list[route[q]].duration for q in range(start + 1, p + 1)]
+            return prefix + times, lunch
+    return None
+
+
+class Schedule:
+    """
+    A timed plan of the day: the route of each employee, the begin time of each visited node and the lunch breaks.
+    Routes are stored in the format of the tabu search, i.e. routes[k] = [k, v1, ..., vn].
+    """
+
+    def __init__(self, routes, begin_times=None, lunch_times=None):
+        self.routes = {k: list(route) for k, route in routes.items()}
+        # begin_times[i] is the begin time of the node i, return_times[k] the time at which employee k is home
+        self.begin_times = dict(begin_times) if begin_times else {}
+        self.return_times = {}
+        # lunch_times[k] is the start of the lunch break of employee k
+        self.lunch_times = dict(lunch_times) if lunch_times else {}
+        # tasks which should not be performed anymore
+        self.cancelled = set()
+        # employees whose route could not be made feasible
+        self.infeasible = set()
+        if begin_times is None:
+            for k in self.routes:
+                self.retime(k)
+
+    @classmethod
+    def from_greedy(cls, greedy_solution):
+        """Build the schedule of a GreedySolution after optimization"""
+        routes = {}
+        begin_times = {}
+        for k, node_list in greedy_solution.employee_node_lists.items():
+            # the greedy solution ends each route with the employee's home
+            routes[k] = [k] + node_list[:-1]
+            for i in node_list[:-1]:
+                begin_times[i] = greedy_solution.node_begin_time[i]
+        schedule = cls(routes, begin_times, greedy_solution.employee_lunch_time)
+        for k, node_list in greedy_solution.employee_node_lists.items():
+            schedule.return_times[k] = greedy_solution.node_begin_time[k]
+        return schedule
+
+    @classmethod
+    def from_routes(cls, routes):
+        """Build the schedule of routes in the tabu search format, e.g. the result of tabu_search"""
+        return cls(routes)
+
+    @classmethod
+    def from_result(cls, result, task_id_of=None):
+        """
+        Build the schedule stored in a result file, for the currently loaded instance.
+        :param result: a ResultFile or the path of a file written by store_result_V3 or Schedule.write_result
+        :param task_id_of: function giving the label used in the file for a task index, defaults to the task id
+        """
+        if isinstance(result, str):
+            result = read_result(result)
+        if task_id_of is None:
+            task_id_of = lambda i: Node.list[i].id
+        task_index = {task_id_of(i): i for i, node in enumerate(Node.list) if node.node_type == "task"}
+        employee_index = {employee.name: k for k, employee in enumerate(Employee.list)}
+        node_position = {id(node): idx for idx, node in enumerate(Node.list)}
+
+        begin_times = {}
+        visits = {k: [] for k in range(len(Employee.list))}
+        for task_id, name, start in result.performed_tasks():
+            k, i = employee_index[name], task_index[task_id]
+            visits[k].append(i)
+            begin_times[i] = start
+        for k, employee in enumerate(Employee.list):
+            for unavail in employee.unavails:
+                i = node_position[id(unavail)]
+                visits[k].append(i)
+                begin_times[i] = unavail.opening_time
+        routes = {k: [k] + sorted(visits[k], key=lambda i: begin_times[i]) for k in visits}
+        lunch_times = {employee_index[name]: start for name, start in result.lunch_times.items()}
+        schedule = cls(routes, begin_times, lunch_times)
+        for k, route in routes.items():
+            last = route[-1]
+            finish = begin_times[last] + Node.list[last].duration if last != k else Employee.list[k].start_time
+            schedule.return_times[k] = finish + travel_time(last, k)
+        return schedule
+
+    def write_result(self, target_path):
+        """Write the schedule in the required format, tasks being labelled by their id"""
+        task_indices = [i for i, node in enumerate(Node.list) if node.node_type == "task"]
+        task_employee = {v: k for k, route in self.routes.items() for v in route[1:]}
+        write_result(target_path, [employee.name for employee in Employee.list],
+                     [Node.list[i].id for i in task_indices],
+                     [task_employee.get(i, -1) for i in task_indices],
+                     [self.begin_times.get(i) for i in task_indices],
+                     [self.lunch_times.get(k) for k in range(len(Employee.list))])
+
+    def copy(self):
+        """Return a copy of the schedule sharing no mutable data with the instance"""
+        schedule = Schedule(self.routes, self.begin_times, self.lunch_times)
+        schedule.return_times = dict(self.return_times)
+        schedule.cancelled = set(self.cancelled)
+        schedule.infeasible = set(self.infeasible)
+        return schedule
+
+    def retime(self, employee_idx, start=0, ready_time=None, lunch_time=None):
+        """
+        Recalculate the begin times of the route of an employee after the given position
+        :return: whether the route is feasible
+        """
+        route = self.routes[employee_idx]
+        timing = time_route(route, start, ready_time, lunch_time)
+        if timing is None:
+            self.infeasible.add(employee_idx)
+            return False
+        times, lunch = timing
+        for v, begin in zip(route[start + 1:], times):
+            self.begin_times[v] = begin
+        self.return_times[employee_idx] = times[-1]
+        self.lunch_times[employee_idx] = lunch
+        self.infeasible.discard(employee_idx)
+        return True
+
+    def repair(self):
+        """
+        Drop tasks from the routes which cannot be timed, the last ones first, until every route can be timed,
+        e.g. for routes accepted by the tabu search whose lunch break does not fit the timing of time_route
+        :return: the dropped tasks
+        """
+        dropped = []
+        for k in sorted(self.infeasible):
+            route = self.routes[k]
+            while not self.retime(k):
+                tasks = [p for p in range(1, len(route)) if Node.list[route[p]].node_type == "task"]
+                if not tasks:
+                    break
+                dropped.append(route.pop(tasks[-1]))
+        for v in dropped:
+            self.begin_times.pop(v, None)
+        return dropped
+
+    def visited_tasks(self):
+        return [v for route in self.routes.values() for v in route[1:] if Node.list[v].node_type == "task"]
+
+    def unassigned_tasks(self):
+        """Indices of the tasks which are neither performed nor cancelled"""
+        visited = set(self.visited_tasks())
+        return [i for i, node in enumerate(Node.list)
+                if node.node_type == "task" and i not in visited and i not in self.cancelled]
+
+    def calculate_time(self):
+        """calculate the total time spent on work"""
+        return sum(Node.list[i].duration for i in self.visited_tasks())
+
+    def calculate_distance(self):
+        """Total distance in km"""
+        res = 0
+        for route in self.routes.values():
+            for prev, curr in zip(route, route[1:] + route[:1]):
+                res += Node.distance[prev, curr]
+        return res / 1000
+
+    def assignment(self):
+        """Return the dictionaries (Z, B) expected by store_result_V3 and plot_agenda_V3"""
+        Z, B = {}, {}
+        for k, route in self.routes.items():
+            for v in route:
+                Z[v] = k
+            for v in route[1:]:
+                B[v] = self.begin_times[v]
+        return Z, B
+
+
+class ScheduleDelta:
+    """The changes that occurred since a schedule was computed"""
+
+    def __init__(self):
+        self.added_tasks = []  # arguments of the Task constructor and closed intervals
+        self.removed_tasks = []  # task ids
+        self.added_unavails = []  # arguments of the Unavail constructor
+        self.removed_unavails = []  # (employee name, start time in minutes)
+        self.delays = {}  # employee name -> delay in minutes
+
+    def add_task(self, task_id, latitude, longitude, duration, skill, level, opening_time, closing_time,
+                 closed_intervals=()):
+        """Register a new task, times are given in the format of the instance files (e.g. '8:00AM')"""
+        self.added_tasks.append(((task_id, latitude, longitude, duration, skill, level, opening_time, closing_time),
+                                 [(parse_time_minute(s), parse_time_minute(e)) for s, e in closed_intervals]))
+        return self
+
+    def remove_task(self, task_id):
+        self.removed_tasks.append(task_id)
+        return self
+
+    def add_unavail(self, employee_name, latitude, longitude, start, end):
+        self.added_unavails.append((employee_name, latitude, longitude, start, end))
+        return self
+
+    def remove_unavail(self, employee_name, start):
+        self.removed_unavails.append((employee_name, to_minutes(start)))
+        return self
+
+    def delay(self, employee_name, minutes):
+        """Register that the employee is running late by the given number of minutes"""
+        self.delays[employee_name] = self.delays.get(employee_name, 0) + minutes
+        return self
+
+    def changes_nodes(self):
+        return bool(self.added_tasks or self.added_unavails or self.removed_unavails)
+
+
+def to_minutes(time):
+    """Keep minutes as they are, parse strings and datetime objects like the instance loaders do"""
+    if isinstance(time, int):
+        return time
+    return parse_time_minute(time)
+
+
+def _apply_node_changes(delta):
+    """
+    Add and remove the nodes of the delta while keeping the order homes, tasks, unavailabilities of Node.list
+    :return: the new index of each node index of the previous instance, removed nodes are absent
+    """
+    previous_list, previous_distance = Node.list[:], Node.distance
+    Node.open_for_update()
+
+    new_tasks = []
+    for arguments, closed_intervals in delta.added_tasks:
+        task = Task(*arguments)
+        task.closed_intervals = sorted(closed_intervals)
+        new_tasks.append(task)
+    for arguments in delta.added_unavails:
+        unavail = Unavail(*arguments)
+        unavail.employee.unavails.sort(key=lambda u: u.opening_time)
+    for employee_name, start in delta.removed_unavails:
+        employee = Employee.find_by_name(employee_name)
+        for unavail in employee.unavails:
+            if unavail.opening_time == start:
+                employee.unavails.remove(unavail)
+                Unavail.list.remove(unavail)
+                Unavail.count -= 1
+                break
+
+    Node.list = Home.list + Task.list + Unavail.list
+    Node.count = len(Node.list)
+    Node.update_distance(previous_list, previous_distance)
+    models_v3_greedy.update_indices()
+    models_v3_tabu.update_indices()
+
+    position = {id(node): idx for idx, node in enumerate(Node.list)}
+    correspondence = {old: position[id(node)] for old, node in enumerate(previous_list) if id(node) in position}
+    return correspondence, [position[id(task)] for task in new_tasks]
+
+
+def _remap(schedule, correspondence):
+    """Rename the node indices of the schedule after the instance was modified"""
+    schedule.routes = {k: [correspondence[v] for v in route if v in correspondence]
+                       for k, route in schedule.routes.items()}
+    schedule.begin_times = {correspondence[v]: t for v, t in schedule.begin_times.items() if v in correspondence}
+    schedule.cancelled = {correspondence[v] for v in schedule.cancelled if v in correspondence}
+
+
+def _insertion_cost(route, position, node_idx):
+    """Additional distance when inserting the node after route[position]"""
+    prev = route[position]
+    nxt = route[position + 1] if position + 1 < len(route) else route[0]
+    return Node.distance[prev, node_idx] + Node.distance[node_idx, nxt] - Node.distance[prev, nxt]
+
+
+def replan(schedule, delta, current_time, reinsert_unassigned=True):
+    """
+    Repair a schedule after intraday changes instead of solving the instance from scratch.
+    Nodes which began before current_time are frozen, only the routes touched by the delta are
+    re-timed, and the tasks they lose are inserted back greedily together with the new tasks.
+    :param schedule: the current Schedule, computed on the currently loaded instance
+    :param delta: a ScheduleDelta describing the changes
+    :param current_time: the current time in minutes, or a string like '10:30AM'
+    :param reinsert_unassigned: whether the tasks left out of the current plan can be inserted in the repaired routes
+    :return: the repaired Schedule, the instance (Node.list, Node.distance, indices) is updated in place
+    """
+    current_time = to_minutes(current_time)
+    schedule = schedule.copy()
+    new_tasks = []
+    if delta.changes_nodes():
+        correspondence, new_tasks = _apply_node_changes(delta)
+        _remap(schedule, correspondence)
+    node_position = {id(node): idx for idx, node in enumerate(Node.list)}
+
+    # frozen[k] is the position of the last node of route k which has already begun
+    frozen = {}
+    for k, route in schedule.routes.items():
+        p = 0
+        while p + 1 < len(route) and schedule.begin_times.get(route[p + 1], current_time + 1) <= current_time:
+            p += 1
+        frozen[k] = p
+
+    affected = set()
+    for task_id in delta.removed_tasks:
+        task_idx = node_position[id(Task.find_by_id(task_id))]
+        schedule.cancelled.add(task_idx)
+        for k, route in schedule.routes.items():
+            if task_idx in route[frozen[k] + 1:]:
+                route.remove(task_idx)
+                affected.add(k)
+    for employee_name, _ in delta.removed_unavails:
+        affected.add(Employee.find_by_name(employee_name).index_of())
+    for employee_name, *_ in delta.added_unavails:
+        k = Employee.find_by_name(employee_name).index_of()
+        route = schedule.routes[k]
+        for unavail in Employee.list[k].unavails:
+            unavail_idx = node_position[id(unavail)]
+            if unavail_idx in route:
+                continue
+            p = frozen[k] + 1
+            while p < len(route) and schedule.begin_times.get(route[p], 0) < unavail.opening_time:
+                p += 1
+            route.insert(p, unavail_idx)
+        affected.add(k)
+    for employee_name in delta.delays:
+        affected.add(Employee.find_by_name(employee_name).index_of())
+
+    def ready_state(k):
+        """
+        (ready time, fixed lunch time) of employee k at the end of the frozen part of their route, not before
+        current_time: an idle employee cannot visit anything in the past
+        """
+        employee = Employee.list[k]
+        route = schedule.routes[k]
+        lunch = schedule.lunch_times.get(k)
+        lunch = lunch if lunch is not None and lunch <= current_time else None
+        if frozen[k] == 0:
+            ready = employee.start_time
+        else:
+            last = route[frozen[k]]
+            ready = schedule.begin_times[last] + Node.list[last].duration
+        if lunch is not None and lunch + LUNCH_DURATION > ready:
+            ready = lunch + LUNCH_DURATION
+        return max(ready + delta.delays.get(employee.name, 0), current_time), lunch
+
+    # step A: make the affected routes feasible again by dropping tasks which are not frozen
+    dropped = []
+    for k in sorted(affected):
+        route = schedule.routes[k]
+        ready, lunch = ready_state(k)
+        while time_route(route, frozen[k], ready, lunch) is None:
+            removable = [p for p in range(frozen[k] + 1, len(route)) if Node.list[route[p]].node_type == "task"]
+            if not removable:
+                break
+            feasible = [p for p in removable
+                        if time_route(route[:p] + route[p + 1:], frozen[k], ready, lunch) is not None]
+            # drop the shortest task restoring feasibility, or the last one if a single removal is not enough
+            p = min(feasible, key=lambda q: Node.list[route[q]].duration) if feasible else removable[-1]
+            dropped.append(route.pop(p))
+        schedule.retime(k, frozen[k], ready, lunch)
+
+    # step B: insert the new and dropped tasks, longest first, at the cheapest feasible position
+    pool = set(new_tasks) | set(dropped)
+    if reinsert_unassigned:
+        pool |= set(schedule.unassigned_tasks())
+    for task_idx in sorted(pool, key=lambda i: -Node.list[i].duration):
+        candidates = schedule.routes.keys() if task_idx in new_tasks else affected
+        best = None
+        for k in candidates:
+            if k in schedule.infeasible:
+                continue
+            route = schedule.routes[k]
+            ready, lunch = ready_state(k)
+            for p in range(frozen[k], len(route)):
+                cost = _insertion_cost(route, p, task_idx)
+                if best is not None and cost >= best[0]:
+                    continue
+                if time_route(route[:p + 1] + [task_idx] + route[p + 1:], frozen[k], ready, lunch) is not None:
+                    best = (cost, k, p)
+        if best is None:
+            continue
+        _, k, p = best
+        schedule.routes[k].insert(p + 1, task_idx)
+        affected.add(k)
+        ready, lunch = ready_state(k)
+        schedule.retime(k, frozen[k], ready, lunch)
+
+    visited = set(schedule.visited_tasks())
+    for task_idx in pool:
+        if task_idx not in visited:
+            schedule.begin_times.pop(task_idx, None)
+    return schedule
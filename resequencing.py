@@ -0,0 +1,160 @@
+"""
+Exact resequencing of the route of one employee: the order of its tasks and unavailabilities travelling the least
+distance, found by a label-setting dynamic program over the subsets of visited nodes.
+
+A label is the state of a partial route: the set of nodes visited, the last one, whether the lunch break was taken,
+the distance travelled and the time at which the employee is ready to leave. Visits begin as early as possible, in
+an open interval of the task, and the lunch break is taken right after a visit (or before leaving home) between 12
+and 13 o'clock, as in replanning.time_route. A label is dropped when another label of the same state is shorter and
+ready earlier, or when a remaining node cannot be reached anymore.
+
+The best order of each set of nodes is memoized, so that a route which comes back in the search is not solved again.
+"""
+# module importation
+from collections import OrderedDict
+
+# model classes for employees and nodes
+from models_v2 import Employee, Node
+from replanning import travel_time, LUNCH_EARLIEST, LUNCH_LATEST, LUNCH_DURATION
+
+MAX_STOPS = 12  # routes with more stops are left unchanged, the number of labels growing exponentially
+
+
+class Sequence:
+    """Best order of the nodes of a route, in the format of the tabu search, with its timing"""
+    __slots__ = ["route", "begin_times", "lunch_time", "return_time", "distance"]
+
+    def __init__(self, route, begin_times, lunch_time, return_time, distance):
+        self.route = route  # [home, v1, ..., vn]
+        self.begin_times = begin_times  # begin time of v1, ..., vn
+        self.lunch_time = lunch_time
+        self.return_time = return_time  # arrival time at home
+        self.distance = distance  # in meter
+
+
+class SequenceCache:
+    """Best sequences already computed, by employee and set of nodes, for the currently loaded instance"""
+    max_size = 100000
+    entries = OrderedDict()
+    distance = None  # distance matrix of the instance the entries belong to
+
+    @classmethod
+    def get(cls, key):
+        if cls.distance is not Node.distance:
+            cls.clear()
+            cls.distance = Node.distance
+        if key in cls.entries:
+            cls.entries.move_to_end(key)
+            return cls.entries[key], True
+        return None, False
+
+    @classmethod
+    def put(cls, key, sequence):
+        cls.entries[key] = sequence
+        if len(cls.entries) > cls.max_size:
+            cls.entries.popitem(last=False)
+
+    @classmethod
+    def clear(cls):
+        cls.entries = OrderedDict()
+
+
+def resequence(route, max_stops=MAX_STOPS):
+    """
+    Find the order of the nodes of a route travelling the least distance
+    :param route: the route in the format of the tabu search, [home, v1, ..., vn]
+    :param max_stops: routes with more nodes are not resequenced
+    :return: the best Sequence, or None if the route has too many nodes or no order of its nodes is feasible
+    """
+    stops = route[1:]
+    if len(stops) > max_stops:
+        return None
+    key = (route[0], frozenset(stops))
+    sequence, found = SequenceCache.get(key)
+    if not found:
+        sequence = _solve(route[0], sorted(stops))
+        SequenceCache.put(key, sequence)
+    return sequence
+
+
+def _solve(k, stops):
+    employee = Employee.list[k]
+    if any(Node.list[v].node_type == "task" and Node.list[v].level > employee.level for v in stops):
+        return None
+    n = len(stops)
+    points = [k] + stops  # position 0 is home, position p > 0 is stops[p - 1]
+    travel = [[travel_time(a, b) for b in points] for a in points]
+    distance = [[Node.distance[a, b] for b in points] for a in points]
+    duration = [0] + [Node.list[v].duration for v in stops]
+    # windows[p]: (earliest, latest) begin times of the visit of the stop p, as in replanning.earliest_begin
+    windows = [[]] + [[(v.opening_time, v.opening_time)] if v.node_type == "unavail"
+                      else [(start, end - v.duration) for start, end in v.open_intervals()]
+                      for v in (Node.list[v] for v in stops)]
+    latest = [0] + [max((end for _, end in window), default=-1) for window in windows[1:]]
+
+    def earliest_begin(p, arrival_time):
+        for start, end in windows[p]:
+            if max(arrival_time, start) <= end:
+                return max(arrival_time, start)
+        return None
+
+    # layers[size][(mask, last, lunch)] = [(distance, ready time, order, begin times, lunch time)], non-dominated
+    layers = [{} for _ in range(n + 1)]
+
+    def add(state, label):
+        front = layers[bin(state[0]).count("1")].setdefault(state, [])
+        for other in front:
+            if other[0] <= label[0] and other[1] <= label[1]:
+                return
+        front[:] = [other for other in front if not (label[0] <= other[0] and label[1] <= other[1])]
+        front.append(label)
+
+    def reachable(mask, last, ready):
+        """whether every node not visited yet can still be visited right after the last one"""
+        for p in range(1, n + 1):
+            if not mask >> (p - 1) & 1 and ready + travel[last][p] > latest[p]:
+                return False
+        return True
+
+    def extend(mask, last, lunch_taken, label, finish):
+        """record the label after a visit, with and without a lunch break right after it"""
+        if lunch_taken:
+            add((mask, last, True), label)
+            return
+        if finish <= LUNCH_LATEST:
+            add((mask, last, False), label)
+            lunch = max(finish, LUNCH_EARLIEST)
+            if reachable(mask, last, lunch + LUNCH_DURATION):
+                add((mask, last, True), (label[0], lunch + LUNCH_DURATION, label[2], label[3], lunch))
+        # otherwise the lunch break cannot be taken anymore
+
+    extend(0, 0, False, (0.0, employee.start_time, (), (), None), employee.start_time)
+    for size in range(n):
+        for (mask, last, lunch_taken), front in layers[size].items():
+            for d, ready, order, begins, lunch in front:
+                for p in range(1, n + 1):
+                    if mask >> (p - 1) & 1:
+                        continue
+                    begin = earliest_begin(p, ready + travel[last][p])
+                    if begin is None:
+                        continue
+                    new_mask = mask | 1 << (p - 1)
+                    finish = begin + duration[p]
+                    if not reachable(new_mask, p, finish):
+                        continue
+                    extend(new_mask, p, lunch_taken, (d + distance[last][p], finish, order + (p,), begins + (begin,),
+                                                      lunch), finish)
+
+    best = None
+    for (mask, last, lunch_taken), front in layers[n].items():
+        if not lunch_taken:
+            continue
+        for d, ready, order, begins, lunch in front:
+            return_time = ready + travel[last][0]
+            total = d + distance[last][0]
+            if return_time <= employee.end_time and (best is None or (total, return_time) < (best[0], best[1])):
+                best = (total, return_time, order, begins, lunch)
+    if best is None:
+        return None
+    total, return_time, order, begins, lunch = best
+    return Sequence([k] + [points[p] for p in order], list(begins), lunch, return_time, total)
@@ -0,0 +1,179 @@
+"""
+Robustness of a schedule to delays, by Monte-Carlo simulation: task durations and travel times are multiplied by
+random factors, and every scenario is played with the order of visits and the lunch breaks of the schedule, each
+visit beginning as soon as the employee arrives and the task is open. All the scenarios and all the routes are
+simulated at once as NumPy arrays, one step per position in the routes.
+
+The report gives the probability that each task or unavailability is missed (the task cannot be finished before the
+end of its open interval, the employee arrives after the start of the unavailability) and, for each employee, the
+probability of missing the lunch window, of coming back home after the end of the working day, or of any miss.
+
+Usage:
+    python robustness.py ./data/InstancesV3/InstanceUkraineV3.xlsx --algorithm tabu --scenarios 5000
+"""
+# module importation
+import argparse
+
+import numpy as np
+
+# model classes for employees and nodes
+from models_v2 import Employee, Node
+import models_v3_greedy
+import models_v3_tabu
+from replanning import Schedule, travel_time, LUNCH_EARLIEST, LUNCH_LATEST, LUNCH_DURATION
+
+
+class RobustnessReport:
+    """Miss probabilities estimated over n_scenarios delay scenarios"""
+
+    def __init__(self, n_scenarios, node_miss, lunch_miss, end_miss, route_miss):
+        self.n_scenarios = n_scenarios
+        self.node_miss = node_miss  # node index -> probability of missing the task or unavailability
+        # employee index -> probability of not starting lunch by 13 o'clock, 1 if no lunch break is planned
+        self.lunch_miss = lunch_miss
+        self.end_miss = end_miss  # employee index -> probability of coming back home after the end of the day
+        self.route_miss = route_miss  # employee index -> probability of at least one of the misses above
+
+    def expected_misses(self):
+        """Expected number of missed tasks and unavailabilities"""
+        return sum(self.node_miss.values())
+
+    def riskiest_nodes(self, n=10):
+        return sorted(self.node_miss.items(), key=lambda item: -item[1])[:n]
+
+
+def _lognormal(rng, sigma, shape):
+    """Random factors of mean 1"""
+    if sigma <= 0:
+        return np.ones(shape)
+    return rng.lognormal(-sigma ** 2 / 2, sigma, shape)
+
+
+def _route_arrays(schedule, employees):
+    """Arrays (routes x positions) of the visits of the routes, padded after the end of each route"""
+    length = max((len(schedule.routes[k]) - 1 for k in employees), default=0)
+    shape = (len(employees), length)
+    node = np.full(shape, -1, dtype=np.int64)
+    travel, duration = np.zeros(shape), np.zeros(shape)
+    # interval in which the visit may begin: the open interval of the planned begin time for the tasks, the start
+    # of the unavailability for the unavailabilities
+    window_start, window_end = np.zeros(shape), np.zeros(shape)
+    is_task = np.zeros(shape, dtype=bool)
+    travel_home, lunch_position = np.zeros(len(employees)), np.zeros(len(employees), dtype=np.int64)
+    for r, k in enumerate(employees):
+        route = schedule.routes[k]
+        for p, v in enumerate(route[1:]):
+            task = Node.list[v]
+            node[r, p] = v
+            travel[r, p] = travel_time(route[p], v)
+            duration[r, p] = task.duration
+            begin = schedule.begin_times[v]
+            if task.node_type == "task":
+                is_task[r, p] = True
+                window_start[r, p], window_end[r, p] = next(
+                    ((start, end) for start, end in task.open_intervals() if start <= begin <= end),
+                    (task.opening_time, task.closing_time))
+            else:
+                window_start[r, p] = window_end[r, p] = task.opening_time
+        travel_home[r] = travel_time(route[-1], k)
+        # the lunch break is taken after the visits planned to begin before it, -1 if none is planned
+        lunch_time = schedule.lunch_times.get(k)
+        lunch_position[r] = -1 if lunch_time is None else sum(schedule.begin_times[v] < lunch_time for v in route[1:])
+    return node, travel, duration, window_start, window_end, is_task, travel_home, lunch_position
+
+
+def evaluate_schedule(schedule, n_scenarios=1000, duration_sigma=0.2, travel_sigma=0.3, seed=0):
+    """
+    Simulate delay scenarios on a schedule of the currently loaded instance
+    :param schedule: a replanning.Schedule, e.g. Schedule.from_greedy(sol) or Schedule.from_routes(routes)
+    :param duration_sigma: standard deviation of the log of the factors multiplying the task durations
+    :param travel_sigma: standard deviation of the log of the factors multiplying each travel time
+    :return: a RobustnessReport, without the employees whose route cannot be timed (schedule.infeasible)
+    """
+    rng = np.random.default_rng(seed)
+    employees = [k for k in sorted(schedule.routes) if k not in schedule.infeasible]
+    node, travel, duration, window_start, window_end, is_task, travel_home, lunch_position = \
+        _route_arrays(schedule, employees)
+    n_routes, length = node.shape
+    start_time = np.array([Employee.list[k].start_time for k in employees], dtype=float)
+    end_time = np.array([Employee.list[k].end_time for k in employees], dtype=float)
+
+    # ready[s, r]: time at which the employee of route r is free to leave their last visit in scenario s
+    ready = np.broadcast_to(start_time, (n_scenarios, n_routes)).copy()
+    node_missed = np.zeros((n_scenarios, n_routes, length), dtype=bool)
+    # a route without a planned lunch break misses it in every scenario
+    lunch_missed = np.broadcast_to(lunch_position < 0, (n_scenarios, n_routes)).copy()
+    for p in range(length + 1):
+        lunch_now = lunch_position == p
+        if lunch_now.any():
+            lunch = np.maximum(ready[:, lunch_now], LUNCH_EARLIEST)
+            lunch_missed[:, lunch_now] = lunch > LUNCH_LATEST
+            ready[:, lunch_now] = lunch + LUNCH_DURATION
+        if p == length:
+            break
+        visited = node[:, p] >= 0
+        arrival = ready + travel[:, p] * _lognormal(rng, travel_sigma, (n_scenarios, n_routes))
+        begin = np.maximum(arrival, window_start[:, p])
+        task_duration = np.where(is_task[:, p], duration[:, p] * _lognormal(rng, duration_sigma,
+                                                                           (n_scenarios, n_routes)), duration[:, p])
+        finish = begin + task_duration
+        # a task must be finished within its interval, an unavailability must not begin late
+        node_missed[:, :, p] = visited & np.where(is_task[:, p], finish > window_end[:, p], arrival > window_end[:, p])
+        ready = np.where(visited, finish, ready)
+    back_home = ready + travel_home * _lognormal(rng, travel_sigma, (n_scenarios, n_routes))
+    end_missed = back_home > end_time
+
+    node_probability = node_missed.mean(axis=0)
+    route_probability = (node_missed.any(axis=2) | lunch_missed | end_missed).mean(axis=0)
+    node_miss = {int(node[r, p]): float(node_probability[r, p]) for r, p in zip(*np.nonzero(node >= 0))}
+    return RobustnessReport(n_scenarios, node_miss,
+                            dict(zip(employees, lunch_missed.mean(axis=0).tolist())),
+                            dict(zip(employees, end_missed.mean(axis=0).tolist())),
+                            dict(zip(employees, route_probability.tolist())))
+
+
+def evaluate_routes(routes, **options):
+    """Robustness of routes in the format of the tabu search, timed as early as possible (cf. Schedule)"""
+    return evaluate_schedule(Schedule.from_routes(routes), **options)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Probabilities of missing tasks, lunch or end of day under delays")
+    parser.add_argument("instance", help="path of the instance file")
+    parser.add_argument("--algorithm", default="greedy_simultaneous",
+                        choices=["greedy_employee", "greedy_simultaneous", "tabu"])
+    parser.add_argument("--scenarios", type=int, default=1000)
+    parser.add_argument("--duration-sigma", type=float, default=0.2)
+    parser.add_argument("--travel-sigma", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    models_v3_tabu.load_data_from_path(args.instance)
+    if args.algorithm == "tabu":
+        models_v3_tabu.Solution.set_warning(False)
+        routes, _ = models_v3_tabu.tabu_search(init_sol=" ", max_it=30, tabu_step=10, max_len_cross=1,
+                                               block_max=4, plot=False, verbose=False)
+        schedule = Schedule.from_routes(routes)
+        schedule.repair()
+    else:
+        sol = models_v3_greedy.GreedySolution()
+        if args.algorithm == "greedy_employee":
+            sol.optimize_employee_by_employee()
+        else:
+            sol.optimize_simultaneous()
+        schedule = Schedule.from_greedy(sol)
+    report = evaluate_schedule(schedule, args.scenarios, args.duration_sigma, args.travel_sigma, args.seed)
+
+    print(f"{'employee':<16}{'any miss':>10}{'lunch':>10}{'end of day':>12}")
+    for k, probability in report.route_miss.items():
+        print(f"{Employee.list[k].name:<16}{probability:>10.1%}{report.lunch_miss[k]:>10.1%}"
+              f"{report.end_miss[k]:>12.1%}")
+    print(f"expected missed visits: {report.expected_misses():.2f} of {len(report.node_miss)}")
+    for v, probability in report.riskiest_nodes(5):
+        node = Node.list[v]
+        label = node.id if node.node_type == "task" else f"unavailability of {node.employee.name}"
+        print(f"  {label}: {probability:.1%}")
+
+
+if __name__ == "__main__":
+    main()
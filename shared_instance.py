@@ -0,0 +1,163 @@
+"""
+Publication of the loaded instance in shared memory for pools of worker processes.
+The process which loaded the instance copies its numeric data once into shared memory blocks: the distances (the
+dense matrix, or the nearest neighbours of SparseDistance), the coordinates, durations, levels, time windows and
+closed intervals of the nodes and the working hours of the employees. Workers attach to the blocks read-only,
+without reading the instance file nor copying the distances, so the V x V matrix is in memory once per machine.
+
+Usage:
+    models_v3_tabu.load_data_from_path(path)
+    with SharedInstance() as shared:
+        with ProcessPoolExecutor(initializer=attach, initargs=(shared.handle,)) as executor:
+            ...
+"""
+# module importation
+import uuid
+from datetime import datetime, timedelta
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+# model classes for employees and nodes
+from models_v2 import Employee, Node, Task, Home, Unavail
+import models_v3_greedy
+import models_v3_tabu
+
+# state of a worker process: the key of the instance attached and its shared memory blocks
+_attached = None
+_blocks = []
+
+
+class InstanceHandle:
+    """Picklable description of a published instance: the blocks of its arrays and its few strings"""
+
+    def __init__(self, key, arrays, employee_names, employee_skills, task_ids, task_skills):
+        self.key = key  # unique id of the publication
+        self.arrays = arrays  # array name -> (shared memory block name, shape, dtype)
+        self.employee_names = employee_names
+        self.employee_skills = employee_skills
+        self.task_ids = task_ids
+        self.task_skills = task_skills
+
+
+class SharedInstance:
+    """
+    The currently loaded instance, published in shared memory until close() is called, which the publishing process
+    must do once the workers are done (or use the instance as a context manager)
+    """
+
+    def __init__(self):
+        self.blocks = []
+        arrays = {}
+        for name, array in _instance_arrays().items():
+            block = SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+            self.blocks.append(block)
+            arrays[name] = (block.name, array.shape, array.dtype.str)
+        self.handle = InstanceHandle(uuid.uuid4().hex, arrays,
+                                     [employee.name for employee in Employee.list],
+                                     [employee.skill for employee in Employee.list],
+                                     [task.id for task in Task.list], [task.skill for task in Task.list])
+
+    @property
+    def nbytes(self):
+        return sum(block.size for block in self.blocks)
+
+    def close(self):
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _instance_arrays():
+    """Numeric arrays describing the currently loaded instance"""
+    employees = Employee.list
+    employee_index = {employee.name: k for k, employee in enumerate(employees)}
+    arrays = {
+        "employee_position": np.array([[e.latitude, e.longitude] for e in employees], dtype=np.float64).reshape(-1, 2),
+        "employee_data": np.array([[e.level, e.start_time, e.end_time] for e in employees],
+                                  dtype=np.int64).reshape(-1, 3),
+        "node_position": np.array([[node.latitude, node.longitude] for node in Node.list],
+                                  dtype=np.float64).reshape(-1, 2),
+        # duration, level, opening and closing times of the tasks and unavailabilities, employee of the others
+        "node_data": np.array([[getattr(node, "duration", 0), getattr(node, "level", 0),
+                                getattr(node, "opening_time", 0), getattr(node, "closing_time", 0),
+                                employee_index[node.employee.name] if node.node_type != "task" else -1]
+                               for node in Node.list], dtype=np.int64).reshape(-1, 5),
+        "closed_intervals": np.array([[i, start, end] for i, node in enumerate(Node.list) if node.node_type == "task"
+                                      for start, end in node.closed_intervals], dtype=np.int64).reshape(-1, 3),
+    }
+    if isinstance(Node.distance, np.ndarray):
+        arrays["distance"] = Node.distance
+    else:
+        arrays["neighbors"] = Node.distance.neighbors
+        arrays["neighbor_distance"] = Node.distance.neighbor_distance
+    return arrays
+
+
+def _clock(minutes):
+    """Time of the day accepted by the constructors of the models, which parse it back into minutes"""
+    return datetime(1900, 1, 1) + timedelta(minutes=int(minutes))
+
+
+def attach(handle):
+    """
+    Load a published instance in the current process, the distances staying in shared memory (read-only).
+    Nothing is done if the instance is already attached, so it can be called before each task as well as by the
+    initializer of a pool.
+    """
+    global _attached, _blocks
+    if _attached == handle.key:
+        return
+    blocks, arrays = [], {}
+    for name, (block_name, shape, dtype) in handle.arrays.items():
+        block = SharedMemory(name=block_name)
+        array = np.ndarray(shape, np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        blocks.append(block)
+        arrays[name] = array
+
+    Employee.list, Employee.count = [], 0
+    for k, ((latitude, longitude), (level, start, end)) in enumerate(zip(arrays["employee_position"].tolist(),
+                                                                        arrays["employee_data"].tolist())):
+        Employee(handle.employee_names[k], latitude, longitude, handle.employee_skills[k], level, _clock(start),
+                 _clock(end))
+    Node.clear_previous_data()
+    for cls in [Home, Task, Unavail]:
+        cls.list, cls.count = [], 0
+    positions, data = arrays["node_position"].tolist(), arrays["node_data"].tolist()
+    n_employees, n_tasks = len(handle.employee_names), len(handle.task_ids)
+    for i, ((latitude, longitude), (duration, level, opening, closing, k)) in enumerate(zip(positions, data)):
+        if i < n_employees:
+            Home(handle.employee_names[k], latitude, longitude)
+        elif i < n_employees + n_tasks:
+            t = i - n_employees
+            Task(handle.task_ids[t], latitude, longitude, duration, handle.task_skills[t], level, _clock(opening),
+                 _clock(closing))
+        else:
+            Unavail(handle.employee_names[k], latitude, longitude, _clock(opening), _clock(closing))
+    for i, start, end in arrays["closed_intervals"].tolist():
+        Node.list[i].closed_intervals.append((start, end))
+
+    if "distance" in arrays:
+        Node.set_distance(arrays["distance"])
+    else:
+        from sparse_distance import SparseDistance
+        neighbors = (arrays["neighbors"], arrays["neighbor_distance"])
+        Node.set_distance(SparseDistance(Node.list, neighbors[0].shape[1], neighbors=neighbors))
+    models_v3_greedy.update_indices()
+    models_v3_tabu.update_indices()
+
+    for block in _blocks:
+        try:
+            block.close()
+        except BufferError:  # still used, e.g. by a cache of the previous instance, closed when collected
+            pass
+    _attached, _blocks = handle.key, blocks
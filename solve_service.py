@@ -0,0 +1,316 @@
+"""
+Local solve service: an asyncio front end queuing solve jobs, and a pool of worker processes running them.
+Each worker keeps the last instance it loaded, and jobs are preferably sent to a worker where their instance is
+already loaded, so that successive requests on the same instance do not pay the loading and distance matrix again.
+
+The front end speaks JSON lines over TCP, one request per line:
+    {"op": "submit", "instance": "./data/InstancesV3/InstanceUkraineV3.xlsx", "algorithm": "tabu", "budget": 30}
+    {"op": "watch", "job": 1}      -> one line per best-so-far update, then the final status
+    {"op": "cancel", "job": 1}
+    {"op": "result", "job": 1}     -> the status and, once done, the result in the store_result_V3 format
+    {"op": "status"}
+An instance already loaded once can be referred to by its name, e.g. "InstanceUkraineV3".
+
+Usage:
+    python solve_service.py --port 8765 --workers 4
+"""
+# module importation
+import argparse
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import multiprocessing
+import os
+import time
+
+from batch import ALGORITHMS, solve
+
+# state of a worker process: the instance currently loaded, as (path, modification time)
+_loaded = None
+
+
+class _QueueSink:
+    """Instrumentation sink forwarding the iterations of the tabu search to the front end"""
+
+    def __init__(self, queue, job_id):
+        self.queue = queue
+        self.job_id = job_id
+
+    def write(self, record):
+        if record.get("name") == "tabu_iteration":
+            self.queue.put((self.job_id, {"type": "update", "it": record["it"],
+                                          "task_minutes": float(record["best_task_minutes"]),
+                                          "distance_km": float(record["best_distance"]) / 1000}))
+
+    def close(self):
+        pass
+
+
+def _load(path):
+    """Load the instance in the worker, unless it is already loaded"""
+    global _loaded
+    import models_v3_tabu
+
+    key = (os.path.abspath(path), os.path.getmtime(path))
+    if _loaded != key:
+        models_v3_tabu.load_data_from_path(path)
+        _loaded = key
+
+
+def _run_job(job_id, path, algorithm, budget, seed, iterations, gap, result_path, queue, cancelled):
+    """
+    Solve a job in a worker process and write its result file
+    :return: a dictionary with the objective values and the path of the result file
+    """
+    tic = time.perf_counter()
+    _load(path)
+    load_time = time.perf_counter() - tic
+    task_minutes, distance_km, untimed = solve(algorithm, result_path, seed, budget, iterations, gap,
+                                      stop=lambda: cancelled.get(job_id, False), sinks=[_QueueSink(queue, job_id)])
+    return {"task_minutes": task_minutes, "distance_km": distance_km, "result_path": result_path,
+            "untimed_employees": untimed, "load_time": load_time, "solve_time": time.perf_counter() - tic - load_time,
+            "cancelled": bool(cancelled.get(job_id, False))}
+
+
+class Job:
+    def __init__(self, job_id, path, algorithm, budget, seed, iterations, gap):
+        self.id = job_id
+        self.path = path
+        self.algorithm = algorithm
+        self.budget = budget
+        self.seed = seed
+        self.iterations = iterations
+        self.gap = gap
+        self.status = "queued"  # queued, running, done, cancelled or failed
+        self.best = None  # last best-so-far update
+        self.result = None  # output of _run_job, or the error message
+        self.watchers = []  # queues of the clients watching the job
+        self.done = asyncio.Event()
+
+    def info(self):
+        return {"job": self.id, "status": self.status, "instance": self.path, "algorithm": self.algorithm,
+                "best": self.best, "result": self.result}
+
+    def publish(self, record):
+        for watcher in self.watchers:
+            watcher.put_nowait(record)
+
+
+class SolveService:
+    """
+    Queue of solve jobs dispatched to worker processes, to be used from a running event loop.
+    :param workers: number of worker processes, defaults to the number of CPUs
+    :param output_directory: directory of the result files
+    """
+
+    def __init__(self, workers=None, output_directory="./results/service"):
+        self.n_workers = workers or os.cpu_count() or 1
+        self.output_directory = output_directory
+        os.makedirs(output_directory, exist_ok=True)
+        # one process per executor, so that the service knows which instance is loaded in which worker
+        self.executors = [concurrent.futures.ProcessPoolExecutor(max_workers=1) for _ in range(self.n_workers)]
+        self.warm = [None] * self.n_workers  # path of the instance loaded in each worker
+        self.idle = set(range(self.n_workers))
+        self.manager = multiprocessing.Manager()
+        self.progress = self.manager.Queue()
+        self.cancelled = self.manager.dict()
+        self.jobs = {}
+        self.pending = []  # queued jobs, in submission order
+        self.instances = {}  # instance name -> path
+        self.job_ids = itertools.count(1)
+        self.wakeup = asyncio.Event()
+        self.tasks = [asyncio.ensure_future(self._dispatch()), asyncio.ensure_future(self._relay_progress())]
+
+    def resolve(self, instance):
+        """Return the path of an instance given by path or by the name of an instance already submitted"""
+        if instance in self.instances:
+            return self.instances[instance]
+        if not os.path.isfile(instance):
+            raise ValueError(f"unknown instance {instance}")
+        self.instances[os.path.splitext(os.path.basename(instance))[0]] = instance
+        return instance
+
+    def submit(self, instance, algorithm="greedy_simultaneous", budget=None, seed=0, iterations=None, gap=None):
+        """
+        Queue a job
+        :param budget: time limit of the search in seconds, used by the tabu search and the MIP
+        :param iterations: maximum number of iterations of the tabu search, unlimited when a budget is given
+        :param gap: relative gap to the upper bound of the task minutes (cf. bounds.py) stopping the tabu search
+        :return: the job
+        """
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"unknown algorithm {algorithm}, expected one of {ALGORITHMS}")
+        job = Job(next(self.job_ids), self.resolve(instance), algorithm, budget, seed, iterations, gap)
+        self.jobs[job.id] = job
+        self.pending.append(job)
+        self.wakeup.set()
+        return job
+
+    def cancel(self, job_id):
+        """Cancel a queued job, or ask a running tabu search to stop and return its best solution so far"""
+        job = self.jobs[job_id]
+        if job.status == "queued":
+            self.pending.remove(job)
+            self._finish(job, "cancelled")
+        elif job.status == "running":
+            self.cancelled[job_id] = True
+        return job
+
+    async def watch(self, job_id):
+        """Yield the best-so-far updates of a job, then its final state"""
+        job = self.jobs[job_id]
+        watcher = asyncio.Queue()
+        if job.best is not None:
+            watcher.put_nowait(job.best)
+        job.watchers.append(watcher)
+        try:
+            while not job.done.is_set() or not watcher.empty():
+                getter = asyncio.ensure_future(watcher.get())
+                waiter = asyncio.ensure_future(job.done.wait())
+                done, _ = await asyncio.wait([getter, waiter], return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                if getter in done:
+                    yield getter.result()
+                else:
+                    getter.cancel()
+        finally:
+            job.watchers.remove(watcher)
+        yield job.info()
+
+    def result_text(self, job_id):
+        """Content of the result file of a finished job, in the store_result_V3 format"""
+        job = self.jobs[job_id]
+        if job.status not in ["done", "cancelled"] or not isinstance(job.result, dict):
+            return None
+        with open(job.result["result_path"]) as f:
+            return f.read()
+
+    def _finish(self, job, status, result=None):
+        job.status = status
+        job.result = result
+        job.done.set()
+
+    def _pick(self):
+        """Choose the next job and its worker, preferring a worker where the instance of a job is loaded"""
+        for job in self.pending:
+            for worker in self.idle:
+                if self.warm[worker] == job.path:
+                    return job, worker
+        # otherwise the oldest job on a worker whose instance is not needed by another queued job
+        needed = {job.path for job in self.pending[1:]}
+        worker = min(self.idle, key=lambda w: (self.warm[w] in needed, self.warm[w] is not None))
+        return self.pending[0], worker
+
+    async def _dispatch(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            while self.pending and self.idle:
+                job, worker = self._pick()
+                self.pending.remove(job)
+                self.idle.discard(worker)
+                self.warm[worker] = job.path
+                job.status = "running"
+                asyncio.ensure_future(self._run(job, worker))
+
+    async def _run(self, job, worker):
+        loop = asyncio.get_running_loop()
+        result_path = os.path.join(self.output_directory,
+                                   f"{os.path.splitext(os.path.basename(job.path))[0]}_{job.algorithm}_{job.id}.txt")
+        try:
+            result = await loop.run_in_executor(self.executors[worker], _run_job, job.id, job.path, job.algorithm,
+                                                job.budget, job.seed, job.iterations, job.gap, result_path,
+                                                self.progress, self.cancelled)
+        except Exception as error:
+            self.warm[worker] = None  # the state of the worker is unknown
+            self._finish(job, "failed", f"{type(error).__name__}: {error}")
+        else:
+            job.best = {"type": "update", "task_minutes": result["task_minutes"],
+                        "distance_km": result["distance_km"]}
+            self._finish(job, "cancelled" if result["cancelled"] else "done", result)
+        finally:
+            self.cancelled.pop(job.id, None)
+            self.idle.add(worker)
+            self.wakeup.set()
+
+    async def _relay_progress(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job_id, record = await loop.run_in_executor(None, self.progress.get)
+            if job_id is None:
+                return
+            job = self.jobs.get(job_id)
+            if job is not None:
+                job.best = record
+                job.publish(record)
+
+    async def close(self):
+        self.progress.put((None, None))
+        await self.tasks[1]
+        self.tasks[0].cancel()
+        for executor in self.executors:
+            executor.shutdown(cancel_futures=True)
+        self.manager.shutdown()
+
+    async def handle(self, reader, writer):
+        """Serve the JSON lines requests of a client"""
+        async def send(record):
+            writer.write((json.dumps(record) + "\n").encode())
+            await writer.drain()
+
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            try:
+                request = json.loads(line)
+                op = request.get("op")
+                if op == "submit":
+                    job = self.submit(request["instance"], request.get("algorithm", "greedy_simultaneous"),
+                                      request.get("budget"), request.get("seed", 0), request.get("iterations"),
+                                      request.get("gap"))
+                    await send({"job": job.id, "status": job.status})
+                elif op == "watch":
+                    async for record in self.watch(request["job"]):
+                        await send(record)
+                elif op == "cancel":
+                    await send(self.cancel(request["job"]).info())
+                elif op == "result":
+                    await send(dict(self.jobs[request["job"]].info(), text=self.result_text(request["job"])))
+                elif op == "status":
+                    await send({"workers": self.n_workers, "warm": self.warm,
+                                "jobs": [job.info() for job in self.jobs.values()]})
+                else:
+                    raise ValueError(f"unknown op {op}")
+            except Exception as error:
+                await send({"error": f"{type(error).__name__}: {error}"})
+        writer.close()
+
+
+async def serve(host="127.0.0.1", port=8765, workers=None, output_directory="./results/service"):
+    service = SolveService(workers, output_directory)
+    server = await asyncio.start_server(service.handle, host, port)
+    print(f"solve service listening on {host}:{port} with {service.n_workers} workers")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve solve jobs on a local port")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, help="number of worker processes, defaults to the number of CPUs")
+    parser.add_argument("--output", default="./results/service", help="directory of the result files")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.output))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
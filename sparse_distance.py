@@ -0,0 +1,146 @@
+"""
+Distance provider for instances too large for the dense distance matrix: at 50k nodes, the V x V float64 matrix
+would need 20 GB. Only the k nearest neighbours of each node are stored, found with a grid spatial index; they
+answer nearest(), used to build the neighbourhoods of the solvers (cf. neighbor_graph.py).
+Node.distance[i, j] computes every pair on demand with the haversine formula, near pairs included (searching the
+neighbours of a node is slower than the formula), and keeps the last pairs computed in a bounded cache: at most
+cache_size pairs, about 100 bytes each, the cache being emptied when full.
+
+It is read like the dense matrix, Node.distance[i, j], and returns the same values as Node.calculate_distance.
+"""
+# module importation
+from math import radians, cos, sin, asin, sqrt
+
+import numpy as np
+
+EARTH_RADIUS = 6371000  # in meter, as in Node.calculate_distance
+
+
+def haversine_matrix(lat1, lon1, lat2, lon2):
+    """Distances in meter between the points 1 (rows) and the points 2 (columns), coordinates in radians"""
+    dlat = lat2[None, :] - lat1[:, None]
+    dlon = lon2[None, :] - lon1[:, None]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1)[:, None] * np.cos(lat2)[None, :] * np.sin(dlon / 2) ** 2
+    return 2 * np.arcsin(np.sqrt(np.minimum(a, 1))) * EARTH_RADIUS
+
+
+class SparseDistance:
+    """
+    Distances between the nodes, storing the k nearest neighbours of each node
+    :param nodes: the nodes, usually Node.list
+    :param k: number of neighbours stored per node
+    :param cache_size: maximum number of pairs kept in the cache of Node.distance[i, j], which is emptied when full;
+    the default, about 10 MB, is less than the neighbours of 50k nodes
+    :param neighbors: the (neighbors, neighbor_distance) arrays if they are already known, e.g. in shared memory
+    """
+
+    def __init__(self, nodes, k=32, cache_size=100000, neighbors=None):
+        self.count = len(nodes)
+        self.k = min(k, max(self.count - 1, 0))
+        self.cache_size = cache_size
+        self.cache = {}
+        self.hits = 0
+        self.misses = 0
+
+        # coordinates in radians, as Python floats to compute single pairs exactly like Node.calculate_distance
+        self.lat = [radians(node.latitude) for node in nodes]
+        self.lon = [radians(node.longitude) for node in nodes]
+        self.cos_lat = [cos(lat) for lat in self.lat]
+
+        # neighbors[i] are the k nearest nodes of i, sorted by increasing distance neighbor_distance[i]
+        if neighbors is None:
+            neighbors = self._nearest_neighbors(np.array(self.lat), np.array(self.lon))
+        self.neighbors, self.neighbor_distance = neighbors
+
+    @property
+    def shape(self):
+        return (self.count, self.count)
+
+    @property
+    def nbytes(self):
+        """Memory used by the stored neighbours, the cache excluded"""
+        return self.neighbors.nbytes + self.neighbor_distance.nbytes
+
+    def __getitem__(self, key):
+        """Distance in meter between two nodes, computed on demand unless the pair is in the cache"""
+        i, j = key
+        if i == j:
+            return 0
+        # the dense matrix holds calculate_distance(Node.list[i], Node.list[j]) for i > j in both cells
+        if i < j:
+            i, j = j, i
+        pair = i * self.count + j
+        distance = self.cache.get(pair)
+        if distance is not None:
+            self.hits += 1
+            return distance
+        self.misses += 1
+        distance = self.calculate(i, j)
+        if len(self.cache) >= self.cache_size:
+            self.cache.clear()
+        self.cache[pair] = distance
+        return distance
+
+    def calculate(self, i, j):
+        """Haversine distance in meter between the nodes i and j, same operations as Node.calculate_distance"""
+        lat1, lat2 = self.lat[i], self.lat[j]
+        dlon = self.lon[j] - self.lon[i]
+        dlat = lat2 - lat1
+        a = sin(dlat / 2) ** 2 + self.cos_lat[i] * self.cos_lat[j] * sin(dlon / 2) ** 2
+        return 2 * asin(sqrt(a)) * EARTH_RADIUS
+
+    def nearest(self, i):
+        """
+        :return: the indices of the k nearest nodes of node i and their distances, by increasing distance
+        """
+        return self.neighbors[i], self.neighbor_distance[i]
+
+    def _nearest_neighbors(self, lat, lon):
+        """
+        Find the k nearest neighbours of every node with a grid over the equirectangular projection of the nodes.
+        The nodes of each cell are compared with the nodes of the surrounding cells, the ring of cells being
+        widened until it contains the k nearest neighbours (up to the distortion of the projection).
+        """
+        n, k = self.count, self.k
+        neighbors = np.zeros((n, k), dtype=np.int32)
+        neighbor_distance = np.zeros((n, k), dtype=np.float64)
+        if k == 0:
+            return neighbors, neighbor_distance
+
+        x = lon * np.cos(lat.mean())
+        y = lat
+        width, height = max(np.ptp(x), 1e-9), max(np.ptp(y), 1e-9)
+        # about k nodes per cell
+        cell = np.sqrt(width * height * k / n)
+        nx, ny = int(width / cell) + 1, int(height / cell) + 1
+        cx = np.minimum(((x - x.min()) / cell).astype(np.int64), nx - 1)
+        cy = np.minimum(((y - y.min()) / cell).astype(np.int64), ny - 1)
+        cell_id = cx * ny + cy
+        order = np.argsort(cell_id, kind="stable")
+        bounds = np.searchsorted(cell_id[order], np.arange(nx * ny + 1))
+
+        def members(x0, x1, y0, y1):
+            x0, x1, y0, y1 = max(x0, 0), min(x1, nx - 1), max(y0, 0), min(y1, ny - 1)
+            return np.concatenate([order[bounds[a * ny + y0]:bounds[a * ny + y1 + 1]] for a in range(x0, x1 + 1)])
+
+        for c in np.unique(cell_id):
+            a, b = divmod(int(c), ny)
+            points = order[bounds[c]:bounds[c + 1]]
+            ring = 1
+            while True:
+                candidates = members(a - ring, a + ring, b - ring, b + ring)
+                covers_all = a - ring <= 0 and b - ring <= 0 and a + ring >= nx - 1 and b + ring >= ny - 1
+                if len(candidates) > k or covers_all:
+                    distance = haversine_matrix(lat[points], lon[points], lat[candidates], lon[candidates])
+                    distance[points[:, None] == candidates[None, :]] = np.inf
+                    nearest = np.argpartition(distance, k - 1, axis=1)[:, :k]
+                    nearest_distance = np.take_along_axis(distance, nearest, axis=1)
+                    # the nodes outside the ring are at least ring cells away, in the projection
+                    radius = ring * cell * EARTH_RADIUS
+                    if covers_all or nearest_distance.max() <= radius:
+                        break
+                ring += 1
+            by_distance = np.argsort(nearest_distance, axis=1)
+            neighbors[points] = candidates[np.take_along_axis(nearest, by_distance, axis=1)]
+            neighbor_distance[points] = np.take_along_axis(nearest_distance, by_distance, axis=1)
+        return neighbors, neighbor_distance
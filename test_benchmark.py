@@ -0,0 +1,48 @@
+"""
+Comparison of benchmark reports with a baseline.
+
+Usage:
+    python -m pytest test_benchmark.py
+"""
+import copy
+
+from benchmark import compare_to_baseline
+
+METRICS = {"solve_time": 1.0, "task_minutes": 4608.0, "distance_km": 2578.8}
+BASELINE = {"solvers": ["greedy_simultaneous", "tabu"], "instances": {
+    "InstanceUkraineV3": {"load_time": 0.5, "distance_time": 0.01,
+                          "solvers": {"greedy_simultaneous": dict(METRICS), "tabu": dict(METRICS),
+                                      "cluster_mip": {"skipped": "No module named 'gurobipy'"}}},
+    "InstanceItalyV1": {"error": "ValueError: Worksheet named 'Employees Unavailabilities' not found"},
+}}
+
+
+def test_identical_report_has_no_regression():
+    assert compare_to_baseline(copy.deepcopy(BASELINE), BASELINE) == []
+
+
+def test_worse_objective_is_a_regression():
+    report = copy.deepcopy(BASELINE)
+    report["instances"]["InstanceUkraineV3"]["solvers"]["tabu"]["task_minutes"] = 4500.0
+    assert len(compare_to_baseline(report, BASELINE)) == 1
+
+
+def test_crash_or_missing_instance_is_a_regression():
+    report = copy.deepcopy(BASELINE)
+    report["instances"]["InstanceUkraineV3"]["solvers"]["tabu"] = {"error": "MemoryError: "}
+    assert compare_to_baseline(report, BASELINE) == ["InstanceUkraineV3/tabu: MemoryError: "]
+
+    report["instances"]["InstanceUkraineV3"] = {"error": "FileNotFoundError: "}
+    assert compare_to_baseline(report, BASELINE) == ["InstanceUkraineV3: FileNotFoundError: "]
+
+    del report["instances"]["InstanceUkraineV3"]
+    assert compare_to_baseline(report, BASELINE) == ["InstanceUkraineV3: missing from the report"]
+
+
+def test_failures_of_the_baseline_and_solvers_not_run_are_skipped():
+    report = copy.deepcopy(BASELINE)
+    report["solvers"] = ["greedy_simultaneous"]
+    del report["instances"]["InstanceUkraineV3"]["solvers"]["tabu"]
+    report["instances"]["InstanceUkraineV3"]["solvers"]["cluster_mip"] = {"error": "GurobiError: "}
+    report["instances"]["InstanceItalyV1"] = {"error": "ValueError: "}
+    assert compare_to_baseline(report, BASELINE) == []
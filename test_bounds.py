@@ -0,0 +1,35 @@
+"""
+Upper bounds on the task minutes: never below a solution found by the solvers.
+
+Usage:
+    python -m pytest test_bounds.py
+"""
+import glob
+
+import pytest
+
+import models_v3_greedy
+import models_v3_tabu
+from bounds import compute_bounds
+
+
+@pytest.mark.parametrize("path", sorted(glob.glob("./data/InstancesV3/*.xlsx")))
+def test_bounds_are_above_the_greedy_solutions(path):
+    models_v3_tabu.load_data_from_path(path)
+    bounds = compute_bounds()
+    assert bounds.bound == min(bounds.all_tasks, bounds.reachable, bounds.capacity)
+    assert bounds.reachable <= bounds.all_tasks
+    for name in ["optimize_employee_by_employee", "optimize_simultaneous"]:
+        sol = models_v3_greedy.GreedySolution()
+        getattr(sol, name)()
+        task_minutes = sol.calculate_time()
+        assert task_minutes <= bounds.bound
+        assert 0 <= bounds.gap(task_minutes) <= 1
+
+
+def test_bound_is_above_the_tabu_solution():
+    models_v3_tabu.load_data_from_path("./data/InstancesV3/InstanceUkraineV3.xlsx")
+    models_v3_tabu.Solution.set_warning(False)
+    _, (task_minutes, _) = models_v3_tabu.tabu_search(init_sol=" ", max_it=10, tabu_step=10, max_len_cross=1,
+                                                      block_max=4, plot=False, verbose=False)
+    assert task_minutes <= compute_bounds().bound
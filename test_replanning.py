@@ -0,0 +1,97 @@
+"""
+Intraday re-planning: repaired schedules keep the past, drop what is cancelled and stay feasible.
+
+Usage:
+    python -m pytest test_replanning.py
+"""
+import pytest
+
+import models_v3_greedy
+import models_v3_tabu
+from checker import check
+from models_v2 import Employee, Node
+from replanning import Schedule, ScheduleDelta, replan
+
+INSTANCE = "./data/InstancesV3/InstanceUkraineV3.xlsx"
+NOW = 660  # 11 o'clock
+
+
+@pytest.fixture
+def schedule():
+    models_v3_tabu.load_data_from_path(INSTANCE)
+    sol = models_v3_greedy.GreedySolution()
+    sol.optimize_simultaneous()
+    return Schedule.from_greedy(sol)
+
+
+def assert_replanned(before, after, tmp_path):
+    """The visits begun before NOW are kept as they were, the others begin after NOW, and the day is feasible"""
+    for v, begin in before.begin_times.items():
+        if begin <= NOW and v not in after.cancelled:
+            assert after.begin_times[v] == begin
+    for k, route in after.routes.items():
+        for v in route[1:]:
+            assert after.begin_times[v] <= NOW and before.begin_times.get(v) == after.begin_times[v] \
+                or after.begin_times[v] >= NOW
+    assert not after.infeasible
+    path = str(tmp_path / "SolutionUkraineV3.txt")
+    after.write_result(path)
+    report = check(INSTANCE, path)
+    assert report.feasible, str(report)
+
+
+def test_cancelled_tasks_are_dropped(schedule, tmp_path):
+    delta = ScheduleDelta()
+    cancelled = []
+    for route in schedule.routes.values():
+        later = [v for v in route[1:] if schedule.begin_times[v] > NOW and Node.list[v].node_type == "task"]
+        if later:
+            cancelled.append(later[0])
+            delta.remove_task(Node.list[later[0]].id)
+    assert cancelled
+
+    replanned = replan(schedule, delta, NOW)
+    # the instance is updated in place, the tasks keep their index when only tasks are removed
+    assert set(cancelled) <= replanned.cancelled
+    assert not set(cancelled) & set(replanned.visited_tasks())
+    assert_replanned(schedule, replanned, tmp_path)
+
+
+def test_delayed_employee_is_retimed(schedule, tmp_path):
+    k = max(schedule.routes, key=lambda k: len(schedule.routes[k]))
+    delta = ScheduleDelta()
+    delta.delay(Employee.list[k].name, 30)
+
+    replanned = replan(schedule, delta, NOW)
+    later = [v for v in replanned.routes[k][1:] if schedule.begin_times.get(v, NOW + 1) > NOW]
+    assert all(replanned.begin_times[v] >= NOW for v in later)
+    assert_replanned(schedule, replanned, tmp_path)
+
+
+def test_new_task_is_not_timed_in_the_past(schedule):
+    # at 4 pm, an employee has finished their visits for an hour, a new task is at the place of their last visit
+    now = 960
+    k = next(k for k, route in schedule.routes.items() if len(route) > 1
+             and schedule.begin_times[route[-1]] + Node.list[route[-1]].duration <= now - 60)
+    last = Node.list[schedule.routes[k][-1]]
+    delta = ScheduleDelta()
+    delta.add_task("T_NEW", last.latitude, last.longitude, 30, Employee.list[k].skill, 1, "8:00AM", "6:00PM")
+
+    replanned = replan(schedule, delta, now, reinsert_unassigned=False)
+    new_task = next(i for i, node in enumerate(Node.list) if node.node_type == "task" and node.id == "T_NEW")
+    assert new_task in replanned.visited_tasks()
+    assert replanned.begin_times[new_task] >= now
+
+
+def test_repair_drops_tasks_until_the_routes_can_be_timed():
+    models_v3_tabu.load_data_from_path(INSTANCE)
+    # every task in the route of the first employee of sufficient level cannot be timed
+    routes = {k: [k] + [Node.list.index(u) for u in employee.unavails] for k, employee in enumerate(Employee.list)}
+    routes[0] += [i for i in models_v3_greedy.tasks if Node.list[i].level <= Employee.list[0].level]
+    schedule = Schedule.from_routes(routes)
+    assert 0 in schedule.infeasible
+
+    dropped = schedule.repair()
+    assert dropped and not schedule.infeasible
+    assert all(v not in schedule.begin_times for v in dropped)
+    assert schedule.retime(0)
@@ -0,0 +1,87 @@
+"""
+Exact resequencing: the dynamic program finds the shortest feasible order found by trying every permutation.
+
+Usage:
+    python -m pytest test_resequencing.py
+"""
+import itertools
+
+import pytest
+
+import models_v3_greedy
+import models_v3_tabu
+from models_v2 import Employee, Node
+from replanning import time_route, travel_time, LUNCH_EARLIEST, LUNCH_LATEST, LUNCH_DURATION
+from resequencing import SequenceCache, resequence
+
+
+def route_distance(route):
+    return sum(Node.distance[a, b] for a, b in zip(route, route[1:] + route[:1]))
+
+
+def brute_force(route):
+    """Shortest order of the nodes of the route which time_route can time, None if there is none"""
+    best = None
+    for order in itertools.permutations(route[1:]):
+        candidate = [route[0]] + list(order)
+        if time_route(candidate) is not None and (best is None or route_distance(candidate) < best[0]):
+            best = (route_distance(candidate), candidate)
+    return best
+
+
+def assert_feasible_timing(sequence):
+    """Each visit begins in an open interval after the travel from the previous one, lunch included"""
+    k, stops = sequence.route[0], sequence.route[1:]
+    employee = Employee.list[k]
+    assert LUNCH_EARLIEST <= sequence.lunch_time <= LUNCH_LATEST
+    ready, previous, lunch_taken = employee.start_time, k, False
+    for v, begin in zip(stops, sequence.begin_times):
+        node = Node.list[v]
+        if not lunch_taken and begin >= sequence.lunch_time + LUNCH_DURATION + travel_time(previous, v):
+            assert sequence.lunch_time >= ready
+            ready, lunch_taken = sequence.lunch_time + LUNCH_DURATION, True
+        assert begin >= ready + travel_time(previous, v)
+        if node.node_type == "task":
+            assert any(start <= begin and begin + node.duration <= end for start, end in node.open_intervals())
+        else:
+            assert begin == node.opening_time
+        ready, previous = begin + node.duration, v
+    if not lunch_taken:
+        assert sequence.lunch_time >= ready
+        ready = sequence.lunch_time + LUNCH_DURATION
+    assert ready + travel_time(previous, k) <= sequence.return_time <= employee.end_time
+
+
+def short_routes(path, max_stops=6):
+    models_v3_tabu.load_data_from_path(path)
+    routes = []
+    for name in ["optimize_employee_by_employee", "optimize_simultaneous"]:
+        sol = models_v3_greedy.GreedySolution()
+        getattr(sol, name)()
+        routes += [[k] + nodes[:-1] for k, nodes in sol.employee_node_lists.items() if len(nodes) - 1 <= max_stops]
+    return routes
+
+
+@pytest.mark.parametrize("path", ["./data/InstancesV3/InstanceUkraineV3.xlsx",
+                                  "./data/InstancesV3/InstanceColumbiaV3.xlsx"])
+def test_dynamic_program_matches_brute_force(path):
+    SequenceCache.clear()
+    routes = short_routes(path)
+    assert routes
+    for route in routes:
+        sequence, best = resequence(route), brute_force(route)
+        if best is None:
+            assert sequence is None
+            continue
+        assert sequence is not None and sorted(sequence.route) == sorted(route)
+        assert sequence.distance == pytest.approx(best[0])
+        assert route_distance(sequence.route) == pytest.approx(sequence.distance)
+        assert_feasible_timing(sequence)
+
+
+def test_infeasible_and_long_routes():
+    models_v3_tabu.load_data_from_path("./data/InstancesV3/InstanceUkraineV3.xlsx")
+    # more stops than max_stops are left alone
+    assert resequence([0] + models_v3_greedy.tasks[:5], max_stops=4) is None
+    # no employee can perform every task in a day
+    assert resequence([0] + models_v3_greedy.tasks[:12]) is None
@@ -0,0 +1,22 @@
+"""
+Round trip of the result files: what write_result writes, read_result reads back.
+
+Usage:
+    python -m pytest test_result_files.py
+"""
+from utils import write_result, read_result
+
+
+def test_round_trip_with_an_employee_without_lunch(tmp_path):
+    path = str(tmp_path / "SolutionTest.txt")
+    write_result(path, ["Ann", "Bob"], ["T1", "T2", "T3"], [0, -1, 1], [540, None, 804.5], [720, None])
+    result = read_result(path)
+
+    assert result.task_ids == ["T1", "T2", "T3"]
+    assert result.performed == [True, False, True]
+    assert result.employee_names == ["Ann", "", "Bob"]
+    assert result.start_times == [540, None, 804.5]
+    assert result.lunch_times == {"Ann": 720, "Bob": None}
+    assert result.performed_tasks() == [("T1", "Ann", 540), ("T3", "Bob", 804.5)]
+    with open(path) as f:
+        assert "Bob;;\n" in f.read()
@@ -0,0 +1,48 @@
+"""
+Robustness simulation: no miss without delays on a feasible schedule, certain misses on the infeasible parts.
+
+Usage:
+    python -m pytest test_robustness.py
+"""
+import models_v3_greedy
+import models_v3_tabu
+from replanning import Schedule
+from robustness import evaluate_schedule
+
+
+def greedy_schedule(path, method):
+    models_v3_tabu.load_data_from_path(path)
+    sol = models_v3_greedy.GreedySolution()
+    getattr(sol, method)()
+    return Schedule.from_greedy(sol)
+
+
+def test_route_without_lunch_misses_it():
+    schedule = greedy_schedule("./data/InstancesV1/InstancePolandV1.xlsx", "optimize_employee_by_employee")
+    assert schedule.lunch_times[0] is None
+    report = evaluate_schedule(schedule, n_scenarios=100, duration_sigma=0, travel_sigma=0)
+    assert report.lunch_miss[0] == 1.0 and report.route_miss[0] == 1.0
+    assert all(report.route_miss[k] == 0.0 for k in schedule.routes if schedule.lunch_times[k] is not None)
+
+    schedule.lunch_times[1] = None
+    report = evaluate_schedule(schedule, n_scenarios=100)
+    assert report.lunch_miss[1] == 1.0 and report.route_miss[1] == 1.0
+
+
+def test_feasible_schedule_without_delays_misses_nothing():
+    schedule = greedy_schedule("./data/InstancesV3/InstanceUkraineV3.xlsx", "optimize_simultaneous")
+    report = evaluate_schedule(schedule, n_scenarios=10, duration_sigma=0, travel_sigma=0)
+    assert set(report.route_miss) == set(schedule.routes)
+    assert set(report.node_miss) == {v for route in schedule.routes.values() for v in route[1:]}
+    assert max(report.route_miss.values()) == 0.0 and report.expected_misses() == 0.0
+
+
+def test_delays_increase_the_misses():
+    schedule = greedy_schedule("./data/InstancesV3/InstanceUkraineV3.xlsx", "optimize_simultaneous")
+    small = evaluate_schedule(schedule, n_scenarios=2000, duration_sigma=0.1, travel_sigma=0.1)
+    large = evaluate_schedule(schedule, n_scenarios=2000, duration_sigma=0.5, travel_sigma=0.5)
+    assert 0 < small.expected_misses() < large.expected_misses()
+    assert all(0 <= p <= 1 for p in large.node_miss.values())
+    # the scenarios are seeded
+    again = evaluate_schedule(schedule, n_scenarios=2000, duration_sigma=0.5, travel_sigma=0.5)
+    assert again.node_miss == large.node_miss
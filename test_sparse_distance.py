@@ -0,0 +1,42 @@
+"""
+Sparse distances: the same values as the dense matrix, and the true nearest neighbours.
+
+Usage:
+    python -m pytest test_sparse_distance.py
+"""
+import numpy as np
+import pytest
+
+import models_v3_tabu
+from models_v2 import Node
+from sparse_distance import SparseDistance
+
+INSTANCE = "./data/InstancesV3/InstanceRomaniaV3.xlsx"
+
+
+@pytest.fixture(scope="module")
+def dense():
+    models_v3_tabu.load_data_from_path(INSTANCE, sparse=False)
+    return np.array(Node.distance)
+
+
+def test_pairs_equal_the_dense_matrix(dense):
+    sparse = SparseDistance(Node.list, k=8, cache_size=100)
+    n = len(Node.list)
+    for i in range(n):
+        for j in range(n):
+            assert sparse[i, j] == dense[i, j]
+    # the cache stays within its bound
+    assert len(sparse.cache) <= 100
+
+
+@pytest.mark.parametrize("k", [1, 8, 32])
+def test_nearest_neighbours(dense, k):
+    sparse = SparseDistance(Node.list, k=k)
+    for i in range(len(Node.list)):
+        neighbors, distance = sparse.nearest(i)
+        others = np.delete(dense[i], i)
+        assert i not in neighbors and len(set(neighbors.tolist())) == k
+        assert np.all(np.diff(distance) >= 0)
+        np.testing.assert_allclose(distance, np.sort(others)[:k], rtol=1e-9)
+        np.testing.assert_allclose(distance, dense[i, neighbors], rtol=1e-9)
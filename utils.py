@@ -1,5 +1,5 @@
 from datetime import datetime
-import matplotlib.pyplot as plt
+import numpy as np
 import random as rd
 
 
@@ -37,35 +37,94 @@ def parse_time_minute(time):
     return int((parse_time(time) - datetime(year=1901, month=1, day=1, hour=0)).seconds / 60)
 
 
-def store_result(target_path, employees, tasks, lunch_times, z, b):
-    w, t = len(tasks), len(employees)
-    with open(target_path, "w") as f:
-        f.write("taskId;performed;employeeName;startTime; \n")
-        for i in tasks:
-            if i in z.keys():
-                f.write(f"T{i - t + 1};1;{employees[z[i]].name};{b[i].x};\n")
+RESULT_HEADER = "taskId;performed;employeeName;startTime; \n"
+LUNCH_HEADER = "employeeName;lunchBreakStartTime;\n"
+
+
+def write_result(target_path, employee_names, task_ids, task_employee, task_start, lunch_times):
+    """
+    Write a solution in the required format in a single buffered pass.
+    :param employee_names: name of each employee
+    :param task_ids: label of each task, e.g. T1
+    :param task_employee: index of the employee performing each task, -1 (or None) if the task is not performed
+    :param task_start: start time of each task, ignored for tasks which are not performed
+    :param lunch_times: start of the lunch break of each employee, indexed like employee_names, None for an
+    employee without lunch break, whose field is left empty
+    """
+    def task_lines():
+        for task_id, k, start in zip(task_ids, task_employee, task_start):
+            if k is None or k < 0:
+                yield f"{task_id};0;;;\n"
             else:
-                f.write(f"T{i - t + 1};0;;;\n")
+                yield f"{task_id};1;{employee_names[k]};{start};\n"
+
+    with open(target_path, "w", buffering=1 << 16) as f:
+        f.write(RESULT_HEADER)
+        f.writelines(task_lines())
         f.write("\n")
-        f.write("employeeName;lunchBreakStartTime;\n")
-        for k in range(t):
-            f.write(f"{employees[k].name};{lunch_times[k]};\n")
-    return
+        f.write(LUNCH_HEADER)
+        f.writelines(f"{name};{'' if lunch_times[k] is None else lunch_times[k]};\n"
+                     for k, name in enumerate(employee_names))
+
+
+def store_result(target_path, employees, tasks, lunch_times, z, b):
+    t = len(employees)
+    write_result(target_path, [employee.name for employee in employees], [f"T{i - t + 1}" for i in tasks],
+                 [z.get(i, -1) for i in tasks], [b[i].x if i in z else None for i in tasks], lunch_times)
+
 
 def store_result_V3(target_path, employees, tasks, lunch_times, z, b):
-    w, t = len(tasks), len(employees)
-    with open(target_path, "w") as f:
-        f.write("taskId;performed;employeeName;startTime; \n")
-        for i in tasks:
-            if i in z.keys():
-                f.write(f"T{i -t + 1};1;{employees[z[i]].name};{b[i]};\n")
-            else:
-                f.write(f"T{i - t + 1};0;;;\n")
-        f.write("\n")
-        f.write("employeeName;lunchBreakStartTime;\n")
-        for k in range(t):
-            f.write(f"{employees[k].name};{lunch_times[k]};\n")
-    return
+    t = len(employees)
+    write_result(target_path, [employee.name for employee in employees], [f"T{i - t + 1}" for i in tasks],
+                 [z.get(i, -1) for i in tasks], [b.get(i) for i in tasks], lunch_times)
+
+
+class ResultFile:
+    """Content of a result file, stored as one list per column"""
+
+    def __init__(self, task_ids, performed, employee_names, start_times, lunch_times):
+        self.task_ids = task_ids  # label of each task
+        self.performed = performed  # whether each task is performed
+        self.employee_names = employee_names  # name of the employee performing each task, "" if not performed
+        self.start_times = start_times  # start time of each task, None if not performed
+        self.lunch_times = lunch_times  # employee name -> start of the lunch break, None if there is none
+
+    def performed_tasks(self):
+        """Return (task id, employee name, start time) of the performed tasks"""
+        return [(task_id, name, start) for task_id, done, name, start
+                in zip(self.task_ids, self.performed, self.employee_names, self.start_times) if done]
+
+
+def parse_number(text):
+    """Parse '804' or '804.0' as written by store_result and store_result_V3"""
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+def read_result(path):
+    """
+    Read a result file written by store_result or store_result_V3
+    :return: a ResultFile
+    """
+    with open(path) as f:
+        tasks_part, _, lunch_part = f.read().partition("\n\n")
+
+    task_ids, performed, employee_names, start_times = [], [], [], []
+    for line in tasks_part.splitlines()[1:]:
+        fields = line.split(";")
+        if len(fields) < 4:
+            continue
+        task_ids.append(fields[0])
+        performed.append(fields[1] == "1")
+        employee_names.append(fields[2])
+        start_times.append(parse_number(fields[3]) if fields[1] == "1" else None)
+
+    lunch_times = {}
+    for line in lunch_part.splitlines()[1:]:
+        fields = line.split(";")
+        if len(fields) >= 2 and fields[0]:
+            lunch_times[fields[0]] = parse_number(fields[1]) if fields[1] else None
+    return ResultFile(task_ids, performed, employee_names, start_times, lunch_times)
 
 
 def cm_to_inch(value):
@@ -73,6 +132,7 @@ def cm_to_inch(value):
 
 
 def plot_map(employee_list, node_list, tasks, unavails, X, L, Z):
+    import matplotlib.pyplot as plt  # optional dependency, only needed for plotting
     plt.figure(figsize=(cm_to_inch(100), cm_to_inch(100)))
 
     number_of_colors = 8  # hardcoded
@@ -114,62 +174,93 @@ def plot_map(employee_list, node_list, tasks, unavails, X, L, Z):
         plt.scatter([unavail.longitude], [unavail.latitude], label="Indisponibilité de " + unavail.employee.name,
                     marker="$(X)$", c = color[unavail.employee.index_of()], s=10000)
 
-def plot_map_V3(employee_list, node_list, tasks, unavails, X, Z):
-    plt.figure(figsize=(cm_to_inch(100), cm_to_inch(100)))
-
-    number_of_colors = len(employee_list)  # hardcoded
-    color = ["#" + ''.join([rd.choice('0123456789ABCDEF') for _ in range(6)])
-             for _ in range(number_of_colors)]
-
-    node_pos = []
-    for k in range(len(employee_list)):
-        node_pos.append([employee_list[k].longitude, employee_list[k].latitude])
-        plt.scatter([employee_list[k].longitude], [employee_list[k].latitude], label=f"Maison de {employee_list[k].name}", c=color[k],
-                    marker="$(H)$", s=10000)
-
-    t = len(employee_list)
-    all_indexes = list(range(t)) + tasks + unavails
-
-    for i in tasks:
-        if i in Z.keys():
-            task = node_list[i]
-            node_pos.append([task.longitude, task.latitude])
-            plt.scatter([task.longitude], [task.latitude]
-                        , marker=f"$({task.id})$",c = color[Z[i]] ,s=10000)
-        else:
-            task = node_list[i]
-            node_pos.append([task.longitude, task.latitude])
-            plt.scatter([task.longitude], [task.latitude],
-                         marker=f"$({task.id})$",c = "grey", s=10000)
-
-    for i in unavails:
-        unavail = node_list[i]
-        node_pos.append([unavail.longitude, unavail.latitude])
-        plt.scatter([unavail.longitude], [unavail.latitude], label="Indisponibilité de " + unavail.employee.name,
-                    marker="$(X)$", c = color[unavail.employee.index_of()], s=10000)
-
-    
-    n = len(node_pos)
-    for a in range(n):
-        for b in range(n):
-            i = all_indexes[a]
-            j = all_indexes[b]
-            if i != j and (i, j) in list(X.keys()):
-                lbl = ""
-                clr = "black"
-                if i in range(t):
-                    lbl = f"{employee_list[Z[j]].name}"
-                    clr = color[Z[i]]
-                elif j in range(t):
-                    clr = color[Z[j]]
-                else:
-                    clr = color[Z[i]]
-
-                plt.plot([node_pos[a][0], node_pos[b][0]], [
-                         node_pos[a][1], node_pos[b][1]], c=clr, label=lbl)
-
-    plt.legend(prop={'size': 40}, loc='center left', bbox_to_anchor=(1, 0.5))
-    plt.show()
+def route_figure(path=None, size_cm=30):
+    """
+    Create the figure of a map: a pyplot figure to be shown when no path is given, otherwise a figure
+    rendered by Agg which does not need a display
+    """
+    if path is None:
+        import matplotlib.pyplot as plt  # optional dependency, only needed for plotting
+        return plt.figure(figsize=(cm_to_inch(size_cm), cm_to_inch(size_cm)))
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    figure = Figure(figsize=(cm_to_inch(size_cm), cm_to_inch(size_cm)))
+    FigureCanvasAgg(figure)
+    return figure
+
+
+def plot_routes(employee_list, node_list, tasks, unavails, edges, Z, path=None, marker=False, legend=None,
+                size_cm=30, dpi=150):
+    """
+    Draw the routes of the employees, with one line collection for all the edges and one scatter call per kind
+    of node, so that thousands of routes are drawn in seconds
+    :param edges: (i, j) node indices of the edges travelled by the employees
+    :param Z: node index -> index of the employee visiting it, nodes absent from Z are not visited
+    :param path: file where the map is written, its extension (.png, .svg, ...) gives the format,
+    None to show the map
+    :param marker: write the id of each task next to it
+    :param legend: whether to list the employees in a legend, defaults to True up to 20 employees
+    :return: the figure
+    """
+    # optional dependency, only needed for plotting; pyplot is not imported when the map is written to a file
+    from matplotlib import colormaps
+    from matplotlib.collections import LineCollection
+    from matplotlib.lines import Line2D
+
+    n_employees = len(employee_list)
+    color_map = colormaps["tab20" if n_employees <= 20 else "hsv"].resampled(max(n_employees, 1))
+    colors = color_map(np.arange(n_employees))
+    position = np.array([[node.longitude, node.latitude] for node in node_list], dtype=float).reshape(-1, 2)
+    employee_index = {employee: k for k, employee in enumerate(employee_list)}
+
+    figure = route_figure(path, size_cm)
+    ax = figure.add_subplot()
+
+    # edges, colored by the employee travelling them
+    edges = [(i, j) for i, j in edges if i != j]
+    if edges:
+        edges = np.array(edges)
+        edge_owner = np.array([Z[i] if i in Z else Z[j] for i, j in edges])
+        ax.add_collection(LineCollection(position[edges], colors=colors[edge_owner], linewidths=1, zorder=1))
+
+    # homes, visited and unvisited tasks, unavailabilities
+    homes = np.arange(n_employees)
+    ax.scatter(*position[homes].T, c=colors[homes], marker="s", s=40, edgecolors="black", zorder=3)
+    tasks = np.asarray(tasks, dtype=int)
+    visited = np.array([i in Z for i in tasks], dtype=bool)
+    ax.scatter(*position[tasks[~visited]].T, c="grey", s=10, zorder=2)
+    ax.scatter(*position[tasks[visited]].T, c=colors[[Z[i] for i in tasks[visited]]].reshape(-1, 4), s=15, zorder=2)
+    unavails = np.asarray(unavails, dtype=int)
+    unavail_owner = [employee_index[node_list[i].employee] for i in unavails]
+    ax.scatter(*position[unavails].T, c=colors[unavail_owner].reshape(-1, 4), marker="x", s=30, zorder=2)
+
+    if marker:
+        for i in tasks:
+            ax.annotate(node_list[i].id, position[i], fontsize=6, xytext=(2, 2), textcoords="offset points")
+    if legend if legend is not None else n_employees <= 20:
+        handles = [Line2D([], [], color=colors[k], marker="s", label=employee.name)
+                   for k, employee in enumerate(employee_list)]
+        ax.legend(handles=handles, loc="center left", bbox_to_anchor=(1, 0.5))
+    ax.autoscale_view()
+    ax.set_xlabel("longitude")
+    ax.set_ylabel("latitude")
+
+    if path is None:
+        import matplotlib.pyplot as plt
+        plt.show()
+    else:
+        figure.savefig(path, dpi=dpi, bbox_inches="tight")
+    return figure
+
+
+def plot_map_V3(employee_list, node_list, tasks, unavails, X, Z, path=None, marker=True):
+    """
+    Draw the solution of the MIP
+    :param X: dictionary whose keys are the (i, j) edges travelled
+    :param Z: node index -> index of the employee visiting it
+    :param path: file where the map is written, None to show it
+    """
+    return plot_routes(employee_list, node_list, tasks, unavails, X.keys(), Z, path=path, marker=marker)
 
 
 def time_format(min):
@@ -177,6 +268,7 @@ def time_format(min):
 
 
 def plot_agenda(employee_list, node_list, tasks, unavails, B, Z, lunch_times):
+    import matplotlib.pyplot as plt  # optional dependency, only needed for plotting
     N = len(employee_list)
 
     plan = [[] for i in range(N)]
@@ -222,6 +314,7 @@ def plot_agenda(employee_list, node_list, tasks, unavails, B, Z, lunch_times):
     plt.show()
 
 def plot_agenda_V3(employee_list, node_list, tasks, unavails, B, Z, lunch_times):
+    import matplotlib.pyplot as plt  # optional dependency, only needed for plotting
     N = len(employee_list)
 
     plan = [[] for i in range(N)]